@@ -0,0 +1,78 @@
+"""
+Dream Cafe - Bounds module
+Version: 0.1.3
+
+The bounds module caches bounding boxes, so nodes that don't move aren't traversed over and over again.
+Global boxes and local radii are kept separately: the radius only depends on geometry, so it is computed once.
+
+Static nodes (tables, cards, posters, targets) are only recomputed after an explicit invalidate(). All other
+nodes are recomputed at most once per frame, so a lookup never costs
+more than the one getBoundingBox call it replaces. Call invalidate() after moving a node from Python if it is
+looked up again in the same frame. Boxes returned from the cache are shared, so don't modify them.
+
+"""
+
+import viz
+
+class BoundsCache():
+    def __init__(self):
+        self.boxes = {}     # node: [frame or None if static, global bounding box]
+        self.radii = {}     # node: local bounding radius
+        self.static = set()
+        self.resetStats()
+
+    def setStatic(self, node, state=True):
+        if state:
+            self.static.add(node)
+        else:
+            self.static.discard(node)
+        self.boxes.pop(node, None)
+
+    def invalidate(self, node=None):
+        # Invalidate one node, or everything if no node is given
+        if node is None:
+            self.boxes.clear()
+        else:
+            self.boxes.pop(node, None)
+
+    def forget(self, node):
+        # Call when a node is removed
+        self.boxes.pop(node, None)
+        self.radii.pop(node, None)
+        self.static.discard(node)
+
+    def getBoundingBox(self, node):
+        frame = viz.getFrameNumber()
+        entry = self.boxes.get(node)
+        if entry and (entry[0] is None or entry[0] == frame):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        bb = node.getBoundingBox()
+        self.boxes[node] = [None if node in self.static else frame, bb]
+        return bb
+
+    def getRadius(self, node):
+        if node in self.radii:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.radii[node] = max(node.getBoundingBox(viz.REL_LOCAL).size) / 2.0
+        return self.radii[node]
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.startFrame = viz.getFrameNumber()
+
+    def getStats(self):
+        frames = max(viz.getFrameNumber() - self.startFrame, 1)
+        return {
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'hits_per_frame' : self.hits / float(frames),
+            'misses_per_frame' : self.misses / float(frames),
+            'entries' : len(self.boxes) + len(self.radii),
+            }
+
+bounds = BoundsCache()
@@ -0,0 +1,115 @@
+"""
+Dream Cafe - Census module
+Version: 0.1.3
+
+The census module counts what is alive in the scene at a regular interval, to catch leaks over long sessions:
+items by category (in use and parked in pools), item links, itemRegistry and dynamicItems entries, live coroutines
+and pending timers. Other modules can add their own counts with addProbe().
+
+A count that grew at every one of the last few samples is flagged (logWarn). All samples and flags are written
+to data/census_<timestamp>.csv through ruviz.data.
+
+Pending timers are the vizact.ontimer2 one-shots that haven't fired yet; repeating timers are counted separately.
+Vizard doesn't expose its timer list, so install() wraps vizact.ontimer2 and vizact.ontimer.
+
+"""
+
+import viz, vizact
+from ruviz import data
+import common
+from coroutines import coroutines
+
+CENSUS_TIME = 60 #s
+GROWTH_SAMPLES = 6 # Flag counts that grew over this many samples in a row
+
+class TimerCounter():
+    def __init__(self):
+        self.installed = False
+        self.pending = 0
+        self.repeating = 0
+
+    def install(self):
+        if self.installed:
+            return
+        self.installed = True
+        ontimer2 = vizact.ontimer2
+        ontimer = vizact.ontimer
+        def _ontimer2(rate, repeats, func, *args, **kwargs):
+            if repeats == 0:
+                self.pending += 1
+                func = self._once(func)
+            else:
+                self.repeating += 1
+            return ontimer2(rate, repeats, func, *args, **kwargs)
+        def _ontimer(rate, func, *args, **kwargs):
+            self.repeating += 1
+            return ontimer(rate, func, *args, **kwargs)
+        vizact.ontimer2 = _ontimer2
+        vizact.ontimer = _ontimer
+
+    def _once(self, func):
+        def _fire(*args, **kwargs):
+            self.pending -= 1
+            return func(*args, **kwargs)
+        return _fire
+
+timers = TimerCounter()
+
+class Census(viz.EventClass):
+    def __init__(self, interval=CENSUS_TIME, samples=GROWTH_SAMPLES):
+        viz.EventClass.__init__(self)
+        self.interval = interval
+        self.samples = samples
+        self.probes = []
+        self.history = []
+        self.flagged = set()
+        self.logger = None
+
+    def addProbe(self, name, func):
+        self.probes.append((name, func))
+
+    def start(self):
+        coroutines.install()
+        timers.install()
+        self.logger = data.EventLogger('census')
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.starttimer(0, self.interval, viz.FOREVER)
+
+    def count(self):
+        counts = {}
+        for item in common.itemRegistry.items.values():
+            if isinstance(item, (common.DynamicObject, common.TargetObject)):
+                continue # Templates and targets live for the whole session
+            key = 'pooled_' if getattr(item, 'pooled', False) else 'items_'
+            key += item.category
+            counts[key] = counts.get(key, 0) + 1
+            if isinstance(item.link, viz.VizLink):
+                counts['links'] = counts.get('links', 0) + 1
+        counts['links'] = counts.get('links', 0)
+        counts['registry'] = len(common.itemRegistry)
+        counts['dynamic_items'] = len(common.dynamicItems)
+        counts['coroutines'] = coroutines.count()
+        counts['timers_pending'] = timers.pending
+        counts['timers_repeating'] = timers.repeating
+        for name, func in self.probes:
+            counts[name] = func()
+        return counts
+
+    def _growing(self, key):
+        values = [h.get(key, 0) for h in self.history]
+        return len(values) > self.samples and all([b > a for a,b in zip(values, values[1:])])
+
+    def _onTimer(self, id):
+        counts = self.count()
+        self.history = (self.history + [counts])[-(self.samples + 1):]
+        self.logger.log('census', *['{}={}'.format(k, counts[k]) for k in sorted(counts)])
+        for key in sorted(counts):
+            if self._growing(key):
+                if key not in self.flagged:
+                    self.flagged.add(key)
+                    viz.logWarn('** WARNING: {} grew in each of the last {} censuses, now {}'.format(key, self.samples, counts[key]))
+                    self.logger.log('growth', key, counts[key])
+            else:
+                self.flagged.discard(key)
+
+census = Census()
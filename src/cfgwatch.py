@@ -0,0 +1,70 @@
+"""
+Dream Cafe - Config watch module
+Version: 0.1.3
+
+The config watch module reloads cfg/*.cfg while the experiment runs. A background thread polls the files' mtimes
+and sizes (Config.stamps(), which only stats them); when they change, the render thread reloads the config, which
+re-parses only the changed files, and sends the event given to start() with {key: (old, new)} of the values that
+changed. A config that no longer loads (e.g. a missing key or a value of the wrong type) is reported and the running
+values stay as they were.
+
+"""
+
+import threading
+import viz
+from ruviz.utils import ConfigError
+
+POLL_TIME = 0.5 #s
+
+class ConfigWatcher(viz.EventClass):
+    def __init__(self, period=POLL_TIME):
+        viz.EventClass.__init__(self)
+        self.period = period
+        self.cfg = None
+        self.event = None
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self, cfg, event):
+        self.cfg = cfg
+        self.event = event
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._poll, args=(cfg.stamps(),))
+        self.thread.daemon = True
+        self.thread.start()
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.EXIT_EVENT, self._onExit)
+        self.starttimer(0, self.period, viz.FOREVER)
+
+    def _poll(self, last):
+        while not self.stopped.wait(self.period): # Wakes at once on exit
+            try:
+                stamps = self.cfg.stamps()
+            except OSError:
+                continue # Folder briefly unavailable, e.g. while an editor replaces a file
+            if stamps != last:
+                last = stamps
+                self.changed.set()
+
+    def _onTimer(self, id):
+        if not self.changed.is_set():
+            return
+        self.changed.clear()
+        try:
+            changes = self.cfg.reload()
+        except ConfigError as e:
+            viz.logError('** ERROR: Config not reloaded: {}'.format(e))
+            return
+        if changes:
+            viz.sendEvent(self.event, changes)
+
+    def _onExit(self, *args):
+        # Stop the thread before the interpreter shuts down under it
+        self.killtimer(0)
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+watcher = ConfigWatcher()
@@ -12,17 +12,45 @@ Todo: should find better descriptions for objects (node3d) and items (Object cla
 
 """
 
-import viz, vizact, vizshape
+import viz, vizact, vizshape, vizmat
 import math
+import numpy as np
 from ruviz import utils
-
-utils.init() # Load default settings
+from bounds import bounds
+from spatial import grid
+from transforms import transforms
+from visibility import visibility
+from registry import ItemSet, ItemRegistry, GrabbableSet
+from eventprofile import profiler
+from tracing import tracer
+from startup import startup
+import lcdatlas
+
+startup.start() # Time resource loading, see the end of this module
+with startup.phase('utils.init'):
+    utils.init() # Load default settings
 
 """
 Config & Defaults
 """
 
-cfg = utils.Config() # Load config
+CONFIG_SCHEMA = {
+    # Key binds
+    'start':'key', 'gravity':'key', 'shuffle':'key', 'customer':'key', 'time':'key', 'binmove':'key',
+    'stare':'key', 'mannequin':'key', 'cancel':'key', 'poster':'key', 'junk':'key',
+    # Hardware
+    'g_vive':'bool', 'g_viveoffset':('list','float'), 'g_viveori':'float',
+    # Diagnostics
+    'd_debug':'bool', 'd_eventprofile':'bool', 'd_trace':'bool', 'd_hitches':'bool', 'd_census':'bool',
+    'd_metrics':'bool', 'd_metricsport':'int', 'd_metricshost':'str', 'd_posestream':'bool', 'd_gcgovernor':'bool', 'd_startup':'bool',
+    # Experiment
+    'g_handphysics':'bool', 'g_livereload':'bool', 'r_clock':'str', 't_order':'int', 't_expiration':'int', 't_consumption':('list','int'),
+    't_cleanup':'int', 't_clearseat':'int', 't_autocustomer':('list','int'), 't_autoevent':('list','int'),
+    't_autowaste':('list','int'), 'g_autoevents':('list','str'),
+    }
+
+with startup.phase('Config()'):
+    cfg = utils.Config(schema=CONFIG_SCHEMA) # Load config, default.cfg then user.cfg
 
 KEY_START = cfg.get('start')
 KEY_GRAVITY = cfg.get('gravity')
@@ -40,6 +68,20 @@ VIVE = cfg.get('g_vive', 'bool')
 VIVE_OFFSET = cfg.get('g_viveoffset','list','float') #Standing:[0,0,5.8]#R2 Vive:[1.45,0,4.5]
 VIVE_ORI = [cfg.get('g_viveori','float'), 0, 0]
 DEBUG = cfg.get('d_debug', 'bool')
+EVENT_PROFILE = cfg.get('d_eventprofile', 'bool')
+if EVENT_PROFILE:
+    profiler.install() # Before any handlers are registered
+TRACE = cfg.get('d_trace', 'bool')
+if TRACE:
+    tracer.enable() # Before any traced functions are defined
+HITCHES = cfg.get('d_hitches', 'bool') # See hitches, started by experiment
+CENSUS = cfg.get('d_census', 'bool') # See census, started by experiment
+METRICS = cfg.get('d_metrics', 'bool') # See metrics, started by experiment
+METRICS_PORT = cfg.get('d_metricsport', 'int')
+METRICS_HOST = cfg.get('d_metricshost', 'str') # 127.0.0.1 (this PC only) or e.g. 0.0.0.0 for a scraper elsewhere
+POSE_STREAM = cfg.get('d_posestream', 'bool') # See posestream, started by experiment
+GC_GOVERNOR = cfg.get('d_gcgovernor', 'bool') # See gcgovernor, started by experiment
+STARTUP_PROFILE = cfg.get('d_startup', 'bool')
 
 HANDPHYSICS = cfg.get('g_handphysics', 'bool')
 CLOCK_TYPE = cfg.get('r_clock','str')
@@ -53,17 +95,30 @@ AUTO_CUST_TIME = cfg.get('t_autocustomer','list','int') #range
 AUTO_WASTE_TIME = cfg.get('t_autowaste','list','int') #range
 
 AUTO_EVENTS = cfg.get('g_autoevents', 'list', 'str')
+
+LIVE_RELOAD = cfg.get('g_livereload', 'bool') # See cfgwatch, started by experiment
+LIVE_CONFIG = { # Config key: constant, updated when the config is reloaded. Other keys need a restart.
+    'start':'KEY_START', 'gravity':'KEY_GRAVITY', 'shuffle':'KEY_SHUFFLE', 'customer':'KEY_CUSTOMER',
+    'time':'KEY_CLOCK', 'binmove':'KEY_BINMOVE', 'stare':'KEY_STARE', 'mannequin':'KEY_MANNEQUIN',
+    'cancel':'KEY_CANCEL', 'junk':'KEY_WASTE', 'poster':'KEY_POSTER',
+    't_order':'ORDER_TIME', 't_expiration':'EXPIRATION_TIME', 't_consumption':'CONSUMPTION_TIME',
+    't_cleanup':'CLEANUP_TIME', 't_clearseat':'CLEARSEAT_TIME', 't_autoevent':'AUTO_EVENT_TIME',
+    't_autocustomer':'AUTO_CUST_TIME', 't_autowaste':'AUTO_WASTE_TIME', 'g_autoevents':'AUTO_EVENTS',
+    }
 
 MAX_WAITING_CUSTOMERS = 4
 SLEEP = 6 #frames
+POOL_PARK = [0,-10,0] # Pooled items wait out of sight
+PART_ROLES = {'main':'main', 'consumed':'consumed', 'coffee':'cupCoffee'} # Role: sub-node name pattern
 
 GRAVITY = [0,-9.81,0]
 ZEROG = [0.0, 0.0, 0.0]
 TRAY_REQUEST_SIZE = 2
 
-itemRegistry = {}
-dynamicItems = []
-targetItems = []
+itemRegistry = ItemRegistry() # node: PhysicsObject
+dynamicItems = ItemSet()
+grabbables = GrabbableSet() # Shared by all grabbers
+targetItems = ItemSet()
 
 spawns = {
     'order' : [-.4,1.0,6.3],        #xyz global
@@ -114,6 +169,19 @@ STARE_EVENT = viz.getEventID('STARE_EVENT')
 MANNEQUIN_EVENT = viz.getEventID('MANNEQUIN_EVENT')
 WASTE_EVENT = viz.getEventID('WASTE_EVENT')
 POSTER_EVENT = viz.getEventID('POSTER_EVENT')
+RETIRE_EVENT = viz.getEventID('RETIRE_EVENT') # An item left play (recycled or removed), see retire()
+CONFIG_EVENT = viz.getEventID('CONFIG_EVENT')
+
+def onConfigChanged(changes):
+    # Everything reads these constants through common when it needs them, so setting them takes effect live
+    for key, (old, new) in sorted(changes.items()):
+        if key in LIVE_CONFIG:
+            globals()[LIVE_CONFIG[key]] = new
+            viz.logNotice('Config: {} = {}'.format(key, new))
+        else:
+            viz.logWarn('** WARNING: Config "{}" changed, restart to apply it'.format(key))
+
+viz.callback(CONFIG_EVENT, onConfigChanged)
 
 """
 Events
@@ -143,11 +211,19 @@ class EventHandler(viz.EventClass):
     def onStart(self,*args,**kwargs):
         pass
 
-    def onDiscard(self,object,*args,**kwargs):
-        if object in dynamicItems:
-            dynamicItems.remove(object)
-        itemRegistry.pop(object,None)
-        object.remove()
+    def onDiscard(self,object,generation=None,*args,**kwargs):
+        # generation: the item's generation when the discard was decided, see ItemPool
+        dyno = itemRegistry.get(object)
+        if dyno and generation is not None and generation != dyno.generation:
+            return # Recycled since, leave the new owner's item alone
+        if dyno and dyno.pool:
+            dyno.pool.release(dyno,generation) # Recycle instead of removing
+        else:
+            retire(object)
+            itemRegistry.unregister(object)
+            bounds.forget(object)
+            transforms.invalidate(object)
+            object.remove()
             
     def _placeOrderItem(self,item,parent,offset):
         if offset == 0:
@@ -155,6 +231,7 @@ class EventHandler(viz.EventClass):
         if parent:
             item.link = viz.link(parent.obj,item.obj)
             item.link.preTrans(offset)
+            grid.attach(item.obj,parent.obj)
             item.obj.disable(viz.PHYSICS) # Disable Physics to prevent weirdness
         else:
             x,y,z = offset
@@ -171,29 +248,30 @@ class EventHandler(viz.EventClass):
         
         if len(order.request) > TRAY_REQUEST_SIZE:
             # Add tray for multiple objects
-            tray = obj_tray.copy()
+            tray = obj_tray.spawn()
             self._placeOrderItem(tray,None,0)
             objects.append(tray.obj)
         for item in order.request:
             if item == 'cup':
                 numCups += 1
                 if numCups <= 2: # 2 cups max for now
-                    cup = obj_cup.copy()
+                    cup = obj_cup.spawn()
                     posz = 0.15 - 0.1 * numCups
                     self._placeOrderItem(cup,tray,[.15,.01,posz])                
                     objects.append(cup.obj)
             else:
                 # Add plate for food items
-                plate = obj_plate.copy()
+                plate = obj_plate.spawn()
                 self._placeOrderItem(plate,tray,[-.06,.01,0])
                 if item == 'pie':
-                    food = obj_pie.copy()
+                    food = obj_pie.spawn()
                 else:
-                    food = obj_bread.copy()
+                    food = obj_bread.spawn()
                 self._placeOrderItem(food,plate,[0,.01,0])
                 objects.extend([food.obj,plate.obj])
         order.items = objects
-        viz.sendEvent(ASSEMBLE_EVENT, objects)
+        order.generations = dict([(obj,itemRegistry[obj].generation) for obj in objects])
+        viz.sendEvent(ASSEMBLE_EVENT, objects)
 
     def onDeliver(self,order,complete,*args,**kwargs):
         if complete:
@@ -207,21 +285,18 @@ class EventHandler(viz.EventClass):
     def onExpiration(self,order,*args,**kwargs):
         for obj in order.items:
             if obj not in order.delivered:
-                self.onDiscard(obj)
+                self.onDiscard(obj,order.generations.get(obj))
         obj_orderCard.visible(0)
 
     def _makeDisposable(self,obj,discardFood=True):
         dyno = itemRegistry[obj]
         dyno.disposable = True
-        if dyno.category == 'cup':
-            obj.getChild('cupCoffee').visible(0)
+        if dyno.category == 'cup':
+            dyno.showPart('coffee',0)
         elif dyno.category == 'food':
             if not discardFood:
-                for name in obj.getNodeNames():
-                    if 'main' in name:
-                        obj.getChild(name).visible(0)
-                    elif 'consumed' in name:
-                        obj.getChild(name).visible(1)
+                dyno.showPart('main',0)
+                dyno.showPart('consumed',1)
             else:
                 self.onDiscard(obj)
                 return
@@ -233,9 +308,12 @@ class EventHandler(viz.EventClass):
             pos = obj.getPosition(mode=viz.ABS_GLOBAL)
             ori = obj.getEuler(mode=viz.ABS_GLOBAL)
             dyno.link.remove()
+            dyno.link = None
+            grid.detach(obj)
             pos[1] += 0.04
             obj.setPosition(pos)
             obj.setEuler(ori)
+            grid.wake(obj)
 
         obj.enable(viz.PHYSICS)
 
@@ -246,6 +324,8 @@ class EventHandler(viz.EventClass):
     def onGarbage(self,order,*args,**kwargs):
         for obj in order.delivered:
             dyno = itemRegistry[obj]
+            if dyno.generation != order.generations.get(obj):
+                continue # Binned and recycled before it was eaten, e.g. in zero gravity
             if not dyno.disposable:
                 self._makeDisposable(obj)
 
@@ -276,6 +356,7 @@ class EventHandler(viz.EventClass):
     def onBin(self,spawn,*args,**kwargs):
         obj_bin.obj.setPosition(spawn[:3])
         obj_bin.obj.setEuler([spawn[3],0,spawn[4]])
+        bounds.invalidate(obj_bin.obj)
 
     def onStare(self,state,*args,**kwargs):
         for a in avatars:
@@ -288,7 +369,7 @@ class EventHandler(viz.EventClass):
             avatar.setMannequin(state)
 
     def onWaste(self,pos):
-        waste = obj_waste.copy()
+        waste = obj_waste.spawn()
         waste.disposable = True
         waste.obj.setPosition(pos)
         viz.sendEvent(ASSEMBLE_EVENT, [waste.obj])
@@ -303,11 +384,13 @@ eventHandler = EventHandler() # Start listening to events
 Resources
 """
 
-utils.setRes()
+with startup.phase('setRes'):
+    utils.setRes()
 
 env_cafe = viz.add('dreamcafe.osgb')
-env_cafe.collideMesh()
-env_cafe.collidePlane()
+with startup.phase('dreamcafe collision'):
+    env_cafe.collideMesh()
+    env_cafe.collidePlane()
 env_cafe.disable(viz.DYNAMICS)
 
 tex_shadow = viz.addTexture('shadow.png')
@@ -318,6 +401,7 @@ ocPos = spawns['order']
 obj_orderCard.setPosition([ocPos[0]+0.1,ocPos[1],ocPos[2]+0.3])
 obj_orderCard.setEuler([-30,0,0])
 obj_orderCard.visible(0)
+bounds.setStatic(obj_orderCard)
 
 class PhysicsObject():
     def __init__(self,object,category,collider=0,material='default'):
@@ -327,9 +411,12 @@ class PhysicsObject():
         self.link = None # Used for parenting
         self.disposable = False # Mark as garbage
         self.category = category # Can be string or list
+        self.pool = None # Pool to return to when discarded
+        self.generation = 0 # Bumped each time the pool hands the item out again
+        self.parts = {} # Role: sub-nodes, see DynamicObject
         self.setCollider(collider)
         self.setMaterial(material)
-        itemRegistry[self.obj] = self
+        itemRegistry.register(self)
 
     def setCollider(self,shape,replace=False):
         if replace:
@@ -347,6 +434,10 @@ class PhysicsObject():
             viz.logWarn('**WARNING: Physics shape not available.')
         self.obj.enable(viz.COLLIDE_NOTIFY)
 
+    def showPart(self,role,state):
+        for node in self.parts.get(role,[]):
+            node.visible(state)
+
     def setMaterial(self,material):
         self.material = material
         if self.collider and material in materialProperties:
@@ -356,34 +447,101 @@ class PhysicsObject():
             self.collider.setFriction(p['friction'])
             self.collider.setHardness(p['hardness'])
 
+def retire(obj):
+    # Take an item out of play; RETIRE_EVENT lets other modules drop it too (e.g. proximity targets)
+    dynamicItems.discard(obj)
+    grabbables.remove([obj])
+    viz.sendEvent(RETIRE_EVENT,obj)
+
+class ItemPool():
+    # Ready-made copies of a template, so spawning an order doesn't clone nodes and build colliders.
+    # Whoever keeps an item around (orders, scheduled cleanups) notes its generation; a discard or release that
+    # comes with an older generation is late, the item has been recycled and belongs to someone else now.
+    def __init__(self,template,size=0):
+        self.template = template
+        self.free = []
+        for i in range(size):
+            self.free.append(self._create())
+
+    def _create(self):
+        item = self.template.copy()
+        item.pool = self
+        item.cleanTexture = item.obj.getTexture()
+        self._park(item)
+        return item
+
+    def _park(self,item):
+        item.pooled = True
+        item.obj.visible(0)
+        item.obj.disable(viz.PHYSICS)
+        item.obj.setPosition(POOL_PARK)
+        item.obj.setEuler([0,0,0])
+
+    def acquire(self):
+        item = self.free.pop() if self.free else self._create()
+        item.pooled = False
+        item.generation += 1
+        item.obj.visible(1)
+        item.obj.enable(viz.PHYSICS)
+        dynamicItems.add(item.obj) #Only add copies, not originals!
+        return item
+
+    def release(self,item,generation=None):
+        if item.pooled or (generation is not None and generation != item.generation):
+            return
+        obj = item.obj
+        retire(obj)
+        obj.clearActions()
+        if isinstance(item.link,viz.VizLink):
+            item.link.remove()
+        item.link = None
+        grid.detach(obj)
+        item.disposable = False
+        if obj.getTexture() != item.cleanTexture:
+            obj.texture(item.cleanTexture) # Dirty plate
+        item.showPart('coffee',1) # Full cup, uneaten food
+        item.showPart('main',1)
+        item.showPart('consumed',0)
+        obj.setVelocity([0,0,0])
+        obj.setAngularVelocity([0,0,0])
+        self._park(item)
+        self.free.append(item)
+
 class DynamicObject(PhysicsObject):
-    def __init__(self,object,category,collider=0,material='default'):
+    def __init__(self,object,category,collider=0,material='default',poolSize=0):
         PhysicsObject.__init__(self,object,category,collider=collider,material=material)
         self.obj.visible(0)
+        # Index named sub-nodes by role once, copies look them up by name
+        names = self.obj.getNodeNames()
+        self.roles = {}
+        for role,pattern in PART_ROLES.items():
+            self.roles[role] = [name for name in names if pattern in name]
+        self.itemPool = ItemPool(self,poolSize)
 
     def copy(self):
         new = PhysicsObject(self.obj.copy(),self.category,collider=self.collider.getType(),material=self.material)
-        dynamicItems.append(new.obj) #Only append copies, not originals!
+        new.parts = dict((role,[new.obj.getChild(name) for name in names]) for role,names in self.roles.items())
         new.obj.visible(1)
-        # Hide consumed meshes of food
-        if self.category == 'food':
-            for name in new.obj.getNodeNames():
-                if 'consumed' in name:
-                    new.obj.getChild(name).visible(0)
+        new.showPart('consumed',0) # Hide consumed meshes of food
         return new
 
+    def spawn(self):
+        return self.itemPool.acquire()
+
 class TargetObject(PhysicsObject):
     def __init__(self,object,category,collider=0,material='default'):
         PhysicsObject.__init__(self,object,category,collider=collider,material=material)
         self.obj.disable(viz.DYNAMICS)
-        targetItems.append(self.obj)
-
-obj_tray = DynamicObject('tray.osgb', 'tray')
-obj_plate = DynamicObject('plate.osgb', 'plate')
-obj_cup = DynamicObject('coffeecup.osgb', 'cup')
-obj_pie = DynamicObject('pie.osgb', 'food')
-obj_bread = DynamicObject('bread.osgb', 'food')
-obj_waste = DynamicObject('waste.osgb', 'garbage')
+        targetItems.add(self.obj)
+        bounds.setStatic(self.obj) # Invalidate when moved (bin)
+
+with startup.phase('Item templates and pools'):
+    obj_tray = DynamicObject('tray.osgb', 'tray', poolSize=4)
+    obj_plate = DynamicObject('plate.osgb', 'plate', poolSize=6)
+    obj_cup = DynamicObject('coffeecup.osgb', 'cup', poolSize=8)
+    obj_pie = DynamicObject('pie.osgb', 'food', poolSize=4)
+    obj_bread = DynamicObject('bread.osgb', 'food', poolSize=4)
+    obj_waste = DynamicObject('waste.osgb', 'garbage', poolSize=6)
 
 
 tex_dirtyPlate = viz.addTexture('dirty_plate.tga')
@@ -427,6 +585,8 @@ class Table():
         self.card.setPosition(spawns['card'][str(id)])
         self.card.visible(1)
         self.setID(id)
+        bounds.setStatic(self.obj)
+        bounds.setStatic(self.card)
 
     def _getRelPos(self,spawn,modifier,onTable):
         x = self.bb.center[0] + spawn[0] * modifier[0]
@@ -472,14 +632,16 @@ class Table():
                 rotate = vizact.spinTo(euler=[rot,0,0],speed=180,mode=viz.ABS_GLOBAL)
                 delivery = vizact.parallel(rotate,move)
                 obj.addAction(delivery)
+                grid.wake(obj)
                 dyno.link = 'hack' #Dirty fix for partial delivery
 
 
 tableNodes = ['table01','table09','table02','table07']
 
 for i,node in enumerate(tableNodes):
-    tableCardTextures.append(viz.addTexture('tableCard{}.tga'.format(i+1)))
-    tables.append(Table(i+1,env_cafe.getChild(node)))
+    with startup.phase('Table {}'.format(node)):
+        tableCardTextures.append(viz.addTexture('tableCard{}.tga'.format(i+1)))
+        tables.append(Table(i+1,env_cafe.getChild(node)))
 
 
 # Avatars
@@ -487,6 +649,17 @@ for i,node in enumerate(tableNodes):
 MAX_HEADYAW = 80
 RET_HEADYAW = 180 - MAX_HEADYAW
 MAX_HEADPITCH = 40
+STARE_EPSILON = 0.1 # deg, smaller head turns are not written
+
+# Avatar level of detail, see AvatarLOD
+LOD_FULL = 0    # In view and near: animated, stare every frame
+LOD_REDUCED = 1 # In view but far: animated, stare every STARE_REDUCED frames
+LOD_FROZEN = 2  # Out of view: pose frozen, no stare
+LOD_OFF = 3     # Hidden or not seated: nothing ticks
+LOD_DISTANCE = 4.0 #m
+LOD_TIME = 0.2 #s
+LOD_TURN = 10.0 #deg, a view turn this large re-evaluates the levels right away
+STARE_REDUCED = 3 #frames
 
 ANIM_EAT = 1
 ANIM_SIT_IDLE = 2
@@ -509,8 +682,10 @@ class Avatar(viz.EventClass):
         self.isMannequin = False # Use to spawn as mannequin
 
         self.transport = viz.addGroup()
-        viz.link(self.transport, self.avatar)
-        viz.link(self.transport, self.mannequin)
+        # The transport only moves in sit(), which updates the links; they don't need to run every frame
+        self.transportLinks = [viz.link(self.transport, self.avatar), viz.link(self.transport, self.mannequin)]
+        for link in self.transportLinks:
+            link.setEnabled(False)
 
         self.shadow = vizshape.addQuad(parent=self.transport,axis=vizshape.AXIS_Y)
         self.shadow.texture(tex_shadow)
@@ -524,8 +699,16 @@ class Avatar(viz.EventClass):
         self.lookatNode = viz.addGroup()
         self.lookatLink = viz.link(self.head,self.lookatNode,mask=viz.LINK_POS)
         self.lookatTarget = None
+        self.stareAngles = None # Last written [yaw,pitch], see StareUpdater
+
+        self.seated = False
+        self.lod = None
+        self.setLOD(LOD_OFF)
 
-        self.callback(viz.TIMER_EVENT,self.onUpdate)
+    def setLOD(self,level):
+        if level != self.lod:
+            self.avatar.speed(0 if level >= LOD_FROZEN else 1) # Freeze animations
+            self.lod = level
 
     def sit(self,table_id,seat):
         for table in tables:
@@ -534,7 +717,11 @@ class Avatar(viz.EventClass):
                 self.transport.setPosition(spos)
                 mpr = -1 if spos[0] > table.bb.center[0] else 1
                 self.transport.setEuler([90*mpr,0,0])
+                for link in self.transportLinks:
+                    link.update()
                 self.avatar.state(ANIM_SIT_IDLE)
+        self.seated = True
+        avatarLOD.update()
         self.setMannequin(self.isMannequin)
         self.shadow.visible(1)
 
@@ -544,50 +731,132 @@ class Avatar(viz.EventClass):
     def leave(self):
         for x in [self.avatar,self.mannequin,self.shadow]:
             x.visible(0)
+        self.seated = False
+        self.setLOD(LOD_OFF)
+        avatarLOD.update()
 
     def setMannequin(self,state):
         self.avatar.visible(not state)
         self.mannequin.visible(state)
+        self.setLOD(LOD_OFF if state or not self.seated else LOD_FULL) # AvatarLOD refines this
 
     def stare(self,state,lookat=viz.MainView):
         if state:
             self.lookatTarget = lookat
             self.head.lock()
             self.neck.lock()
-            self.starttimer(101,viz.FASTEST_EXPIRATION,viz.FOREVER)
+            self.stareAngles = None
+            stareUpdater.add(self)
         else:
-            if self.lookatTarget:
-                self.killtimer(101)
+            stareUpdater.remove(self)
             self.lookatTarget = None
             self.head.unlock()
             self.neck.unlock()
 
-    def onUpdate(self,id):
-        if id == 101 and self.lookatTarget:
-            self.lookatNode.lookAt(self.lookatTarget.getPosition(),mode=viz.ABS_GLOBAL)
-            yaw,pitch,roll = self.lookatNode.getEuler(mode=viz.ABS_GLOBAL)
-            yaw -= self.avatar.getEuler()[0]
-
-            # Limit pitch
-            if pitch > MAX_HEADPITCH:
-                pitch = MAX_HEADPITCH
-            elif pitch < - MAX_HEADPITCH:
-                pitch = -MAX_HEADPITCH
-            pitch += 5 #Lookat Height fix
-
-            #Limit yaw
-            if RET_HEADYAW > yaw > MAX_HEADYAW:
-                yaw = MAX_HEADYAW
-            elif -RET_HEADYAW < yaw < -MAX_HEADYAW:
-                yaw = -MAX_HEADYAW
-            elif yaw > RET_HEADYAW:
-                yaw = -yaw + 180
-            elif yaw < -RET_HEADYAW:
-                yaw = abs(yaw) - 180
-            nyaw = yaw * 0.15
-
-            self.head.setEuler([roll,yaw,pitch],mode=viz.AVATAR_LOCAL)
-            self.neck.setEuler([0,nyaw,0],mode=viz.AVATAR_LOCAL)
+class StareUpdater(viz.EventClass):
+    # Turns the heads of all staring avatars in one vectorised pass per frame
+    def __init__(self):
+        viz.EventClass.__init__(self)
+        self.avatars = []
+        self.running = False
+        self.callback(viz.TIMER_EVENT,self._onTimer)
+
+    def add(self,avatar):
+        if avatar not in self.avatars:
+            self.avatars.append(avatar)
+        if not self.running:
+            self.running = True
+            self.starttimer(0,viz.FASTEST_EXPIRATION,viz.FOREVER)
+
+    def remove(self,avatar):
+        if avatar in self.avatars:
+            self.avatars.remove(avatar)
+        if self.running and not self.avatars:
+            self.killtimer(0)
+            self.running = False
+
+    @tracer.span('StareUpdater._onTimer')
+    def _onTimer(self,id):
+        frame = viz.getFrameNumber()
+        staring = [a for a in self.avatars if a.lod == LOD_FULL or (a.lod == LOD_REDUCED and frame % STARE_REDUCED == 0)]
+        if not staring:
+            return
+        heads = np.array([transforms.getPosition(a.lookatNode) for a in staring],dtype=float)
+        targets = np.array([transforms.getPosition(a.lookatTarget) for a in staring],dtype=float)
+        bodies = np.array([transforms.getEuler(a.avatar,viz.ABS_PARENT)[0] for a in staring],dtype=float)
+
+        d = targets - heads
+        yaw = np.degrees(np.arctan2(d[:,0],d[:,2])) - bodies
+        pitch = -np.degrees(np.arctan2(d[:,1],np.hypot(d[:,0],d[:,2])))
+
+        # Limit pitch
+        pitch = np.clip(pitch,-MAX_HEADPITCH,MAX_HEADPITCH) + 5 #Lookat Height fix
+
+        #Limit yaw
+        yaw = np.select([
+            (RET_HEADYAW > yaw) & (yaw > MAX_HEADYAW),
+            (-RET_HEADYAW < yaw) & (yaw < -MAX_HEADYAW),
+            yaw > RET_HEADYAW,
+            yaw < -RET_HEADYAW,
+            ],[MAX_HEADYAW, -MAX_HEADYAW, -yaw + 180, np.abs(yaw) - 180],yaw)
+
+        for a,y,p in zip(staring,yaw.tolist(),pitch.tolist()):
+            last = a.stareAngles
+            if last and abs(last[0] - y) < STARE_EPSILON and abs(last[1] - p) < STARE_EPSILON:
+                continue # Only write bones that moved
+            a.stareAngles = [y,p]
+            a.head.setEuler([0,y,p],mode=viz.AVATAR_LOCAL)
+            a.neck.setEuler([0,y * 0.15,0],mode=viz.AVATAR_LOCAL)
+
+stareUpdater = StareUpdater()
+
+class AvatarLOD(viz.EventClass):
+    # Sets the level of detail of the avatars from their view state and distance, a few times per second and
+    # whenever the view turns far enough to bring avatars into or out of view. Nothing runs while nobody is seated.
+    def __init__(self,avatars,view=viz.MainView):
+        viz.EventClass.__init__(self)
+        self.avatars = avatars
+        self.view = view
+        self.yaw = None # View yaw at the last evaluation
+        self.running = False
+        self.callback(viz.TIMER_EVENT,self._onTimer)
+
+    def update(self):
+        # Called when an avatar sits down or leaves
+        seated = any([a.seated for a in self.avatars])
+        if seated and not self.running:
+            self.running = True
+            self.yaw = None
+            self.starttimer(0,LOD_TIME,viz.FOREVER)
+            self.starttimer(1,viz.FASTEST_EXPIRATION,viz.FOREVER) # View-turn check
+        elif not seated and self.running:
+            self.killtimer(0)
+            self.killtimer(1)
+            self.running = False
+
+    def _onTimer(self,id):
+        yaw = transforms.getEuler(self.view)[0]
+        if id == 1 and self.yaw is not None and abs((yaw - self.yaw + 180.0) % 360.0 - 180.0) < LOD_TURN:
+            return
+        self.yaw = yaw
+        active = []
+        for a in self.avatars:
+            if a.seated and a.avatar.getVisible():
+                active.append(a)
+            else:
+                a.setLOD(LOD_OFF)
+        if not active:
+            return
+        inView = visibility.getInView([a.avatar for a in active])
+        pos = np.array([transforms.getPosition(a.avatar) for a in active],dtype=float)
+        dist = np.linalg.norm(pos - np.array(transforms.getPosition(self.view),dtype=float),axis=1)
+        for a,seen,d in zip(active,inView,dist.tolist()):
+            if not seen:
+                a.setLOD(LOD_FROZEN)
+            elif d > LOD_DISTANCE:
+                a.setLOD(LOD_REDUCED)
+            else:
+                a.setLOD(LOD_FULL)
 
 
 avatar_names = [
@@ -595,7 +864,11 @@ avatar_names = [
     'business01_m','business05_m','casual03_m','casual14_m','casual16_m','casual20_m'
     ]
 
-avatars = [Avatar(path+'_dc.cfg') for path in avatar_names]
+avatars = []
+for path in avatar_names:
+    with startup.phase('Avatar {}'.format(path)):
+        avatars.append(Avatar(path+'_dc.cfg'))
+avatarLOD = AvatarLOD(avatars)
 
 
 # TV Screen
@@ -623,27 +896,64 @@ class AnalogueClock():
         self.hour = hands.getChild('ClockHour')
         self.link = viz.link(parent,self.hands)
         self.link.preEuler([ori,0,0])
+        self.shown = [None,None,None]
         clocks.append(self)
 
     def setTime(self,t):
         ''' Time format: [H,M,S] '''
         h,m,s = t
-        hRot = h%12 * 30 + m * 0.5
-        self.hour.setEuler([0,-hRot,0])
-        self.minute.setEuler([0,m*-6,0])
-        self.second.setEuler([0,s*-6,0])
+        sh,sm,ss = self.shown
+        # Only turn the hands that moved
+        if (h,m) != (sh,sm):
+            hRot = h%12 * 30 + m * 0.5
+            self.hour.setEuler([0,-hRot,0])
+        if m != sm:
+            self.minute.setEuler([0,m*-6,0])
+        if s != ss:
+            self.second.setEuler([0,s*-6,0])
+        self.shown = [h,m,s]
+
+with startup.phase('LCD atlas'):
+    LCD_ATLAS = lcdatlas.getAtlas()
+    if not LCD_ATLAS:
+        viz.logWarn('**WARNING: PIL not available, the digital clock uses text.')
 
 class DigitalClock():
-    def __init__(self,parent,ori,scale=0.3):
+    def __init__(self,parent,ori,scale=0.3,atlas=None):
         self.attach = viz.addGroup()
         viz.link(parent,self.attach)
         self.scale = scale
+        self.atlas = atlas
+        if atlas:
+            # Every value is a cell of one texture: showing it only moves the texture coordinates
+            self.texture = viz.addTexture(atlas)
+            self.cells = []
+            for v in range(lcdatlas.COLUMNS * lcdatlas.ROWS):
+                offset,size = lcdatlas.getCell(v)
+                m = vizmat.Transform()
+                m.setScale(size + [1])
+                m.postTrans(offset + [0])
+                self.cells.append(m)
+            lcd = self._quad
+        else:
+            lcd = self._lcd
         dx = scale * 1
-        self.h = self._lcd(-dx)
-        self.m = self._lcd(0)
-        self.s = self._lcd(dx)
+        self.h = lcd(-dx)
+        self.m = lcd(0)
+        self.s = lcd(dx)
+        self.shown = [None,None,None]
         clocks.append(self)
 
+    def _quad(self,offset):
+        lcd = viz.addTexQuad(parent=viz.WORLD,texture=self.texture)
+        lcd.disable(viz.LIGHTING)
+        lcd.enable(viz.BLEND) # Digits on a transparent background
+        lcd.drawOrder(10) # After the clock face, so the transparent texels don't hide it
+        lcd.zoffset(-1)
+        lcd.setScale([self.scale,self.scale * lcdatlas.CELL[1] / float(lcdatlas.CELL[0]),1])
+        viz.link(self.attach,lcd,offset=[offset,0,0])
+        return lcd
+
     def _lcd(self,offset):
         lcd = viz.addText('88',parent=viz.WORLD)
         lcd.font('digital-7m.ttf')
@@ -657,11 +967,14 @@ class DigitalClock():
 
     def setTime(self,t):
         ''' Time format: [H,M,S] '''
-        def setLCD(lcd, i):
-            lcd.message('{:02d}'.format(i))
-        setLCD(self.h,t[0])
-        setLCD(self.m,t[1])
-        setLCD(self.s,t[2])
+        # Only set the fields that changed
+        for n,(lcd,i) in enumerate(zip([self.h,self.m,self.s],t)):
+            if i != self.shown[n]:
+                if self.atlas:
+                    lcd.texmat(self.cells[i])
+                else:
+                    lcd.message('{:02d}'.format(i))
+                self.shown[n] = i
 
 if CLOCK_TYPE == 'analogue':
     obj_clockHands = viz.add('clockhands.osgb')
@@ -673,7 +986,7 @@ if CLOCK_TYPE == 'analogue':
 else:
     env_cafe.getChild('clock').visible(0) #Hide analogue clock model
 
-digiclock = DigitalClock(obj_tv,0)
+digiclock = DigitalClock(obj_tv,0,atlas=LCD_ATLAS)
 
 
 # Posters
@@ -684,6 +997,7 @@ class Poster():
     def __init__(self, obj, textures):
         self.toggle = viz.cycle(range(len(textures)))
         self.obj = obj
+        bounds.setStatic(obj)
         self.textures = [viz.addTexture(tex) for tex in textures]
         self.swap()
         posters.append(self)
@@ -718,3 +1032,5 @@ class CollisionSoundEmitter(AbstractSoundEmitter):
         self.soundlib = {
             'default' : self.addSFX('.wav')
             }
+
+startup.finish(report=STARTUP_PROFILE) # Puts the viz loaders back
@@ -0,0 +1,53 @@
+"""
+Dream Cafe - Coroutines module
+Version: 0.1.3
+
+The coroutines module keeps count of the viztask coroutines that are alive, by name. Vizard doesn't expose its task
+list, so install() wraps viztask.schedule; a coroutine counts as alive from scheduling until it returns, raises or
+is killed. Only coroutines scheduled after install() are counted.
+
+"""
+
+import types
+import viztask
+
+class CoroutineCounter():
+    def __init__(self):
+        self.installed = False
+        self.active = {}    # name: count
+        self.started = 0
+
+    def install(self):
+        if self.installed:
+            return
+        self.installed = True
+        schedule = viztask.schedule
+        def _schedule(task, *args, **kwargs):
+            if callable(task) and not isinstance(task, types.GeneratorType):
+                task = task()
+            if isinstance(task, types.GeneratorType):
+                task = self._count(task)
+            return schedule(task, *args, **kwargs)
+        viztask.schedule = _schedule
+
+    def _count(self, gen):
+        name = gen.gi_code.co_name
+        self.started += 1
+        self.active[name] = self.active.get(name, 0) + 1
+        try:
+            value = None
+            while True:
+                try:
+                    condition = gen.send(value)
+                except StopIteration:
+                    return
+                value = yield condition
+        finally:
+            self.active[name] -= 1
+            if not self.active[name]:
+                del self.active[name]
+
+    def count(self):
+        return sum(self.active.values())
+
+coroutines = CoroutineCounter()
@@ -0,0 +1,174 @@
+"""
+Dream Cafe - Event profile module
+Version: 0.1.3
+
+The event profile module measures the custom event traffic (ORDER_EVENT, CLOCK_EVENT, ...). When installed it wraps
+every handler registered through viz.callback or viz.EventClass.callback, and counts every viz.sendEvent. Per event
+it reports how often it was sent, how many handlers it fans out to and the wall time of each handler (p50, p99, max),
+and which events were sent in frames that overran the frame budget. The report is logged on exit.
+
+Opt-in with 'seta d_eventprofile "1"'. Install before handlers are registered, i.e. before common sets up its
+EventHandler; handlers registered earlier are not measured.
+
+"""
+
+import sys
+import viz
+from timeit import default_timer as clock
+
+FRAME_BUDGET = 1 / 90.0 #s
+BIN_BASE = 1e-6 #s, upper bound of the first histogram bin
+BIN_GROWTH = 1.25 # Each bin is 25% wider than the previous
+BIN_COUNT = 72 # Up to ~10s
+
+class Histogram():
+    # Log-scaled histogram of durations, fixed size no matter how many samples
+    def __init__(self):
+        self.bins = [0] * BIN_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        i = 0
+        bound = BIN_BASE
+        while value > bound and i < BIN_COUNT - 1:
+            bound *= BIN_GROWTH
+            i += 1
+        self.bins[i] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        # Upper bound of the bin holding the p-th percentile
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.bins):
+            seen += n
+            if seen >= rank:
+                return min(BIN_BASE * BIN_GROWTH ** i, self.max)
+        return self.max
+
+class EventProfiler(viz.EventClass):
+    def __init__(self, budget=FRAME_BUDGET):
+        viz.EventClass.__init__(self)
+        self.budget = budget
+        self.installed = False
+        self.sent = {}          # event: count
+        self.handlers = {}      # event: [handler names]
+        self.times = {}         # (event, handler name): Histogram
+        self.frameEvents = {}   # event: count, in the current frame
+        self.overruns = {}      # event: count, in frames over budget
+        self.overrunFrames = 0
+        self.frames = 0
+        self.lastTick = None
+
+    def install(self):
+        if self.installed:
+            return
+        self.installed = True
+        profiler = self
+        callback = viz.callback
+        classCallback = viz.EventClass.callback
+        sendEvent = viz.sendEvent
+
+        def _callback(event, func, *args, **kwargs):
+            return callback(event, profiler.wrap(event, func), *args, **kwargs)
+        def _classCallback(self, event, func, *args, **kwargs):
+            return classCallback(self, event, profiler.wrap(event, func), *args, **kwargs)
+        def _sendEvent(event, *args, **kwargs):
+            profiler.sent[event] = profiler.sent.get(event, 0) + 1
+            profiler.frameEvents[event] = profiler.frameEvents.get(event, 0) + 1
+            return sendEvent(event, *args, **kwargs)
+
+        viz.callback = _callback
+        viz.EventClass.callback = _classCallback
+        viz.sendEvent = _sendEvent
+
+        classCallback(self, viz.TIMER_EVENT, self._onTimer)
+        classCallback(self, viz.EXIT_EVENT, self._onExit)
+        self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+
+    def wrap(self, event, func):
+        if func is None:
+            return func # Unregister
+        name = self._name(func)
+        self.handlers.setdefault(event, []).append(name)
+        hist = self.times.setdefault((event, name), Histogram())
+        def _timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.add(clock() - t0)
+        return _timed
+
+    def _name(self, func):
+        owner = getattr(func, '__self__', None)
+        name = getattr(func, '__name__', repr(func))
+        return '{}.{}'.format(owner.__class__.__name__, name) if owner is not None else name
+
+    def _onTimer(self, id):
+        # Runs once per frame; attribute the events of the frame that just ended
+        now = clock()
+        if self.lastTick is not None:
+            self.frames += 1
+            if now - self.lastTick > self.budget:
+                self.overrunFrames += 1
+                for event, n in self.frameEvents.items():
+                    self.overruns[event] = self.overruns.get(event, 0) + n
+        self.lastTick = now
+        self.frameEvents.clear()
+
+    def _onExit(self, *args):
+        for line in self.report():
+            viz.logNotice(line)
+
+    def eventNames(self):
+        # Event IDs by the names modules gave them (*_EVENT constants)
+        names = {}
+        for module in sys.modules.values():
+            for attr, value in getattr(module, '__dict__', {}).items():
+                if attr.endswith('_EVENT') and isinstance(value, int) and not isinstance(value, bool):
+                    names.setdefault(value, attr)
+        return names
+
+    def getStats(self):
+        names = self.eventNames()
+        stats = {}
+        for event in set(self.sent.keys()) | set(self.handlers.keys()):
+            handlers = {}
+            for name in self.handlers.get(event, []):
+                hist = self.times[(event, name)]
+                handlers[name] = {
+                    'calls' : hist.count,
+                    'p50' : hist.percentile(50),
+                    'p99' : hist.percentile(99),
+                    'max' : hist.max,
+                    'total' : hist.total,
+                    }
+            stats[names.get(event, str(event))] = {
+                'sent' : self.sent.get(event, 0),
+                'handlers' : len(self.handlers.get(event, [])),
+                'overrun_frames_sent' : self.overruns.get(event, 0),
+                'times' : handlers,
+                }
+        return stats
+
+    def report(self):
+        lines = ['Event profile: {} frames, {} over budget ({:.1f} ms)'.format(self.frames, self.overrunFrames, self.budget * 1000)]
+        lines.append('{:<28}{:>8}{:>9}{:>9}  {:<40}{:>8}{:>10}{:>10}{:>10}'.format('event', 'sent', 'fanout', 'overrun', 'handler', 'calls', 'p50 ms', 'p99 ms', 'max ms'))
+        stats = self.getStats()
+        for event in sorted(stats, key=lambda e: -sum([h['total'] for h in stats[e]['times'].values()])):
+            s = stats[event]
+            rows = sorted(s['times'].items(), key=lambda h: -h[1]['total']) or [('', None)]
+            for i, (name, h) in enumerate(rows):
+                head = '{:<28}{:>8}{:>9}{:>9}'.format(event, s['sent'], s['handlers'], s['overrun_frames_sent']) if i == 0 else ' ' * 54
+                tail = '  {:<40}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}'.format(name[:40], h['calls'], h['p50']*1000, h['p99']*1000, h['max']*1000) if h else ''
+                lines.append(head + tail)
+        return lines
+
+profiler = EventProfiler()
@@ -11,9 +11,22 @@ The experiment module is an executable module that runs the experiment in real-t
 """
 
 import viz, vizact, viztask, vizmat, vizproximity
-import random, time
+import random, time, math
+import numpy as np
 import common
 from tools import grabber
+from visibility import visibility
+from bounds import bounds
+from transforms import transforms
+from spatial import grid
+from tracing import tracer
+from hitches import detector
+from census import census
+from metrics import metrics
+from coroutines import coroutines
+from posestream import stream
+from gcgovernor import governor
+from cfgwatch import watcher
 
 
 """
@@ -26,38 +39,41 @@ transporter = viz.addGroup()
 viz.phys.enable()
 viz.phys.setGravity(common.GRAVITY)
 
+if common.HITCHES:
+    detector.start()
+if common.CENSUS:
+    census.addProbe('customers', lambda: len(customers))
+    census.addProbe('order_queue', lambda: len(order_queue))
+    census.addProbe('delivered_orders', lambda: len(delivered_orders))
+    census.addProbe('grabbables', lambda: len(grabbables))
+    census.start()
+if common.METRICS:
+    metrics.addGauge('frame_time_seconds', 'Duration of the last frame.', viz.getFrameElapsed)
+    metrics.addGauge('physics_bodies', 'Physics items in the scene, not parked in a pool.', lambda: len([i for i in common.itemRegistry.items.values() if not getattr(i,'pooled',False)]))
+    metrics.addGauge('dynamic_items', 'Entries in common.dynamicItems.', lambda: len(common.dynamicItems))
+    metrics.addGauge('order_queue_depth', 'Orders waiting to be displayed.', lambda: len(order_queue))
+    metrics.addGauge('active_order_age_seconds', 'Time since the active order was displayed.', lambda: viz.tick() - active_order.activated if active_order else 0)
+    metrics.addGauge('customers_seated', 'Customers in the cafe.', lambda: len(customers))
+    metrics.addGauge('free_seats', 'Seats available for new customers.', lambda: len(available_seats))
+    metrics.addGauge('waiting_coroutines', 'Live viztask coroutines.', coroutines.count)
+    metrics.addGauge('logger_queue_depth', 'Trace batches waiting for the writer thread.', lambda: tracer.writer.queue.qsize() if tracer.enabled else 0)
+    if common.GC_GOVERNOR:
+        for i in range(3):
+            metrics.addGauge('gc_collections_gen{}'.format(i), 'Collections of GC generation {} run by the governor.'.format(i), lambda i=i: governor.collections[i])
+            metrics.addGauge('gc_pause_max_seconds_gen{}'.format(i), 'Longest collection of GC generation {}.'.format(i), lambda i=i: governor.pauseMax[i])
+        metrics.addGauge('gc_forced', 'Collections forced without slack.', lambda: governor.forced)
+        metrics.addGauge('gc_pause_last_seconds', 'Duration of the last collection.', lambda: governor.pauseLast)
+    metrics.start(common.METRICS_PORT, common.METRICS_HOST)
+if common.GC_GOVERNOR:
+    governor.setIdleProbe(lambda: not customers and not order_queue)
+    governor.start()
+if common.LIVE_RELOAD:
+    watcher.start(common.cfg, common.CONFIG_EVENT)
+
 headCollider = viz.addGroup()
 headCollider.collideSphere(radius=0.15)
 viz.link(viz.MainView,headCollider)
 
-# View Mechanics
-
-lookBase = viz.addGroup()
-viz.link(viz.MainView,lookBase,mask=viz.LINK_POS)
-
-def inView(object):
-    inFov = False
-    dfov = 70 #half FOV (horiz, incl. buffer)
-    lookBase.lookAt(object.getBoundingBox().center)
-    ba = lookBase.getEuler(mode=viz.ABS_GLOBAL)[0]
-    va = viz.MainView.getEuler()[0]
-    r1 = ba - dfov
-    r2 = ba + dfov
-    if r1 < -180:
-        r3 = 180 - (abs(r1)-180)
-        if -180 <  va < r2 or r3 < va < 180:
-            inFov = True
-    elif r2 > 180:
-        r3 = -180 + (r2 - 180)
-        if r1 < va < 180 or -180 < va < r3:
-            inFov = True
-    elif r1 < va < r2:
-        inFov = True
-
-    # Extra test for culling (in case of large objects)
-    result = inFov or not viz.MainWindow.isCulled(object)
-    return result
-
 # Debug
 
 class Debugger():
@@ -75,6 +91,52 @@ Object Interaction
 """
 
 grabbers = []
+grabbables = common.grabbables
+THROW_SAMPLES = 12 # Positions kept per hand
+THROW_WINDOW = 0.1 #s, fit release velocity over this much of the hand's motion
+
+class MotionBuffer():
+    # Preallocated ring buffer of timestamped positions; nothing is allocated when a sample is added.
+    def __init__(self,size=THROW_SAMPLES):
+        self.times = np.zeros(size)
+        self.positions = np.zeros((size,3))
+        self.size = size
+        self.head = 0
+        self.count = 0
+
+    def clear(self):
+        self.count = 0
+
+    def add(self,t,pos):
+        self.times[self.head] = t
+        self.positions[self.head] = pos
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def velocity(self,window=THROW_WINDOW):
+        # Least-squares slope of position over time for the samples within the window
+        if self.count < 2:
+            return [0,0,0]
+        last = self.times[self.head - 1]
+        index = [(self.head - 1 - i) % self.size for i in range(self.count)]
+        index = [i for i in index if last - self.times[i] <= window]
+        if len(index) < 2:
+            index = [(self.head - 1) % self.size, (self.head - 2) % self.size]
+        t = self.times[index]
+        p = self.positions[index]
+        dt = t - t.mean()
+        var = np.dot(dt,dt)
+        if var <= 0:
+            return [0,0,0]
+        return list(np.dot(dt, p - p.mean(axis=0)) / var)
+
+def _updateGrid(added,removed,version):
+    for item in added:
+        grid.add(item)
+    for item in removed:
+        grid.remove(item)
+
+grabbables.subscribe(_updateGrid)
 
 class HandGrabber(viz.EventClass):
     def __init__(self, tracker, model):
@@ -92,39 +154,47 @@ class HandGrabber(viz.EventClass):
         colliderLink = viz.link(transporter,self.collider)
         colliderLink.preMultLinkable(tracker)
 
-        self.vector = [0,0,0]
-        self.oldPos = self.collider.getPosition(viz.ABS_GLOBAL)
+        self.motion = MotionBuffer()
         self.grabbed = None
 
         # Set grabber tool
         self.tool = grabber.Grabber(usingPhysics=True,usingSprings=False)
-        self.tool.setItems(common.dynamicItems)
+        self.candidates = [] # Grabbable items near the hand, refreshed every frame, see onUpdate()
+        self.tool.setItems(self.candidates)
         self.tool._highlighter = None
         self.tool.setUpdateFunction(self.onUpdate)
         viz.link(self.collider,self.tool)
 
         grabbers.append(self)
+        grabbables.subscribe(self.onItemsChanged)
 
         self.callback(grabber.GRAB_EVENT, self.onGrab)
         self.callback(grabber.RELEASE_EVENT, self.onRelease)
 
     def _getBoundRadius(self,item):
-        return max(item.getBoundingBox(viz.REL_LOCAL).size) / 2.0
+        return bounds.getRadius(item)
 
     def _getGrabbable(self,item=None,tolerance=0.02):
         item = item if item else self.tool.getIntersection()
         if item:
-            d = vizmat.Distance(item.getPosition(viz.ABS_GLOBAL),self.collider.getPosition(viz.ABS_GLOBAL))
+            d = vizmat.Distance(transforms.getPosition(item),transforms.getPosition(self.collider))
             if d < self._getBoundRadius(item) + self.collideRadius + tolerance:
                 return True
         return False
 
+    @tracer.span('HandGrabber.onUpdate')
     def onUpdate(self,tool):
         if self.grabbed:
             # Keep track of momentum
-            newPos = self.collider.getPosition(viz.ABS_GLOBAL)
-            self.vector = [a-b for a,b in zip(newPos,self.oldPos)]
-            self.oldPos = newPos
+            self.motion.add(viz.getFrameTime(),transforms.getPosition(self.collider))
+            grid.wake(self.grabbed)
+        else:
+            # Only offer the items in grid cells near the hand
+            near = grid.query(transforms.getPosition(self.collider),self.collideRadius)
+            candidates = [item for item in near if grabbables.isGrabbable(item)]
+            if candidates != self.candidates:
+                self.candidates = candidates
+                self.tool.setItems(candidates)
 
     def grab(self):
         # Test if the grabber is actually touching the object; the standard collision test has a much wider radius.
@@ -134,6 +204,7 @@ class HandGrabber(viz.EventClass):
     def onGrab(self,e):
         if e.grabber == self.tool:
             self.grabbed = e.grabbed
+            self.motion.clear()
             if common.HANDPHYSICS:
                 self.collider.disable(viz.PHYSICS)
         elif e.grabber != self.tool and e.grabbed == self.grabbed:
@@ -148,8 +219,9 @@ class HandGrabber(viz.EventClass):
     def onRelease(self,e):
         if e.grabber == self.tool:
             self.grabbed = None
+            grid.wake(e.released)
             if self.momentum:
-                e.released.applyForce(dir=self.vector,duration=viz.getFrameElapsed()*2.0) # carry momentum over to released object
+                e.released.setVelocity(self.motion.velocity()) # carry momentum over to released object
                 self.momentum = False
             if common.HANDPHYSICS:
                 viztask.schedule(self._releasePhysics(e.released))
@@ -160,11 +232,9 @@ class HandGrabber(viz.EventClass):
             yield viztask.waitFrame(1)        
             self.collider.enable(viz.PHYSICS)
 
-    def addItems(self,items):
-        self.tool.addItems(items)
-
-    def removeItems(self,items):
-        self.tool.removeItems(items)
+    def onItemsChanged(self,added,removed,version):
+        # Candidates are picked from the grid every frame, only drop the ones that are gone
+        self.tool.removeItems(removed)
 
 
 class AbstractController():
@@ -228,8 +298,7 @@ def _placeCustomer(customer):
         for table in common.tables:
             if table.id == customer.table_id:
                 obj = table.obj
-        while inView(obj):
-            yield viztask.waitFrame(common.SLEEP)
+        yield visibility.waitOutOfView(obj)
     viz.sendEvent(common.CUSTOMER_ENTER_EVENT,customer)
     vizact.ontimer2(common.ORDER_TIME,0,createOrder,customer)
     debug.log('Customer created in seat', customer.table_id, customer.seat)
@@ -291,15 +360,18 @@ class Order():
         self.table_id = customer.table_id
         self.seat = customer.seat
         self.items = []
+        self.generations = {} # Item: its pool generation when the order was assembled, see common.ItemPool
         self.delivered = []
         self.cleaned = []
         self.consumed = False
+        self.activated = None
 
 def _queueOrder(order):
     global active_order
     while order_queue[0] != order or viz.phys.getGravity == common.ZEROG:
         yield viztask.waitTime(1)
     active_order = order
+    order.activated = viz.tick()
     viz.sendEvent(common.ORDER_EVENT, order)
     vizact.ontimer2(common.EXPIRATION_TIME,0, expireOrder, order) # Remove order if undelivered/undeliverable
 
@@ -351,6 +423,7 @@ def deliver(order):
         _deliver(order,False)
         debug.log('Partial Order Delivered for Seat: {} {}!'.format(order.table_id,order.seat))
         
+@tracer.span()
 def onEnterProximity(e):
     # Check delivery
     global active_order
@@ -368,8 +441,7 @@ proxyman.onEnter(None,onEnterProximity)
 def _expire(order):
     # Expire order only when out of view
     global active_order
-    while inView(common.obj_orderCard):
-        yield viztask.waitFrame(common.SLEEP)
+    yield visibility.waitOutOfView(common.obj_orderCard)
     for object in order.items:
         try:
             proxyman.remove(object)
@@ -411,8 +483,7 @@ def clearSeat(table_id,seat):
 
 def _killCustomer(order):
     if order.customer.avatar:
-        while inView(order.customer.avatar.avatar):
-            yield viztask.waitFrame(common.SLEEP)
+        yield visibility.waitOutOfView(order.customer.avatar.avatar)
         if not order.customer.avatar in available_avatars:
             available_avatars.append(order.customer.avatar)
     if order.customer in customers:
@@ -424,8 +495,7 @@ def _killCustomer(order):
 
 def _finishConsumption(order):
     # Turn delivered items into garbage (only when eaten and out of view)
-    while inView(order.delivered[0]):
-        yield viztask.waitFrame(common.SLEEP)
+    yield visibility.waitOutOfView(order.delivered[0])
     viz.sendEvent(common.GARBAGE_EVENT,order)
     vizact.ontimer2(common.CLEANUP_TIME,0,cleanupContingency,order)
 
@@ -453,22 +523,26 @@ def cleanup(order):
     if order in delivered_orders:
         delivered_orders.remove(order)
 
-def _cleanupObject(object):
-    while inView(object):
-        yield viztask.waitFrame(common.SLEEP)
-    viz.sendEvent(common.DISCARD_EVENT, object)
+def _cleanupObject(object,generation):
+    yield visibility.waitOutOfView(object)
+    viz.sendEvent(common.DISCARD_EVENT, object, generation) # Ignored if the item was binned and reused meanwhile
 
 def cleanupContingency(order):
     # Make sure table/seat get cleared if ExitProximity fails
     for item in order.delivered:
         if not item in order.cleaned:
-            viztask.schedule(_cleanupObject(item))
+            viztask.schedule(_cleanupObject(item,order.generations.get(item)))
     cleanup(order)
 
+@tracer.span()
 def onExitProximity(e):
     if viz.phys.getGravity != common.ZEROG:
         # Don't trigger in zero gravity
+        dyno = common.itemRegistry.get(e.target)
+        generation = dyno.generation if dyno else None
         for order in delivered_orders:
+            if order.generations.get(e.target) != generation:
+                continue # Binned and reused for a newer order since
             if order.consumed and e.target in order.delivered and not e.target in order.cleaned:
                 order.cleaned.append(e.target)
                 debug.log('cleaning order on seat', order.table_id, order.seat)
@@ -491,7 +565,6 @@ def attemptDiscard(target,object):
         for grabber in grabbers:
             if object == grabber.grabbed:
                 grabber.release()
-            grabber.removeItems([object])
         viz.sendEvent(common.DISCARD_EVENT,object)
 
 
@@ -534,18 +607,14 @@ def shuffleCards(reset=False):
         else:
             debug.log('Cards Shuffled!')
 
-def cardsInView():
-    check = []
-    for table in common.tables:
-        check.append(inView(table.card))
-    print check
-    return False if check == [False] * len(common.tables) else True
-
 def scheduleCardShuffle():
     global waiting_shuffle
     waiting_shuffle = True
     debug.log('Attempting Card Shuffle!')
-    while cardsInView() or active_order:
+    while True:
+        yield visibility.waitOutOfView(*[table.card for table in common.tables])
+        if not active_order:
+            break
         yield viztask.waitFrame(common.SLEEP)
     shuffleCards()
     waiting_shuffle = False
@@ -560,49 +629,74 @@ Clock
 tmodes = ['rt','ff','rw']
 timeToggle = viz.cycle(tmodes+[None])
 
+trates = {'rt':1.0, 'ff':270.0, 'rw':-1.0, None:0.0} # Clock seconds per second; ff used to be 3s per frame at 90 Hz
+DAY = 24 * 60 * 60
+CLOCK_EPSILON = 1e-6 #s
+WALL_CLOCK = bool(int(viz.getOption('dreamcafe.wallclock', 1))) # Off in simulations, see below
+
 class Clock(viz.EventClass):
+    # The time is computed from a base time and a rate, never accumulated. A one-shot timer is set for the moment
+    # the displayed second changes next, and CLOCK_EVENT is only sent when it did. The display shows the second the
+    # clock is in (floor); when a timer lands on a whole second it shows the second being entered, which running
+    # backwards is the one below.
+    # rt reads the wall clock and ticks on its second boundaries. Simulations turn WALL_CLOCK off: rt then starts from
+    # the wall clock's whole second and runs on viz.tick(), so the timer's phase doesn't depend on when a run started.
     def __init__(self):
         viz.EventClass.__init__(self)
         self.t = [0,0,0]
         self.mode = None
+        self.rate = 0.0
+        self.base = 0.0     # Clock time (s) at self.start
+        self.start = 0.0    # viz.tick() when the rate was set
+        self.shown = None   # Displayed second of the day
 
-        self.setMode('rt')
         self.callback(viz.TIMER_EVENT,self._onTimer)
+        self.setMode('rt')
+
+    def _wallTime(self):
+        # Local time of day in seconds
+        now = time.time()
+        lt = time.localtime(now)
+        return lt.tm_hour * 3600 + lt.tm_min * 60 + lt.tm_sec + now % 1.0
+
+    def getTime(self):
+        if self.mode == 'rt' and WALL_CLOCK:
+            return self._wallTime()
+        return self.base + self.rate * (viz.tick() - self.start)
 
+    @tracer.span('Clock._onTimer')
     def _onTimer(self,id):
-        if id == 0: # RT
-            lt = time.localtime()
-            self.t = [lt.tm_hour,lt.tm_min,lt.tm_sec]
-        elif id == 1: # FF
-            h,m,s = self.t
-            s += 3
-            if s >= 60:
-                s = s - 60
-                m += 1
-            if m >= 60:
-                m = m-60
-                h += 1
-            self.t = [h,m,s]
-        elif id == 2: # RW
-            h,m,s = self.t
-            s -= 1
-            if s < 0:
-                s = 60 + s
-                m -= 1
-            if m < 0:
-                m = 60 + m
-                h -= 1
-            self.t = [h,m,s]
-        viz.sendEvent(common.CLOCK_EVENT,self.t)
-
-    def setMode(self,mode):
-        if self.mode:
-            self.killtimer(tmodes.index(self.mode))
-        if mode == 'rt' or mode == 'rw':
-            self.starttimer(tmodes.index(mode),1,viz.FOREVER)
-        elif mode == 'ff':
-            self.starttimer(1,viz.FASTEST_EXPIRATION,viz.FOREVER)
+        self._update(crossing=True)
+
+    def _update(self,crossing=False):
+        value = self.getTime()
+        if self.rate > 0:
+            value = math.floor(value + CLOCK_EPSILON) # A timer lands a rounding error short of the second it waited for
+            delay = (value + 1 - self.getTime()) / self.rate
+        elif self.rate < 0:
+            if crossing:
+                value = math.ceil(value - CLOCK_EPSILON) - 1 # Landed on the second it waited for, moving below it
+            else:
+                value = math.floor(value + CLOCK_EPSILON)
+            delay = (self.getTime() - value) / -self.rate
+        else:
+            delay = None # Stopped
+        second = int(math.floor(value)) % DAY
+        if second != self.shown:
+            self.shown = second
+            self.t = [second // 3600, second // 60 % 60, second % 60]
+            viz.sendEvent(common.CLOCK_EVENT,self.t)
+        if delay is not None:
+            self.starttimer(0,max(delay,viz.FASTEST_EXPIRATION))
+
+    def setMode(self,mode,rate=None):
+        # rt follows the wall clock; ff, rw and None run from the current time at their rate, or at any given rate
+        self.base = math.floor(self._wallTime()) if mode == 'rt' else self.getTime()
+        self.start = viz.tick()
         self.mode = mode
+        self.rate = trates[mode] if rate is None else float(rate)
+        self.killtimer(0)
+        self._update()
 
 mainClock = Clock()
 
@@ -615,8 +709,7 @@ gravToggle = viz.cycle([common.ZEROG, common.GRAVITY])
 
 def _zeroG(obj, waitView=False):
     if waitView:
-        while inView(obj):
-            yield viztask.waitFrame(common.SLEEP)
+        yield visibility.waitOutOfView(obj)
     if viz.phys.getGravity() == common.ZEROG: #Check if still 0 gravity after wait
         # Boost object to make it float.
         N = (0.4 + 0.6 * random.random()) * 0.001 #force
@@ -666,8 +759,7 @@ binNode.setPosition(common.obj_bin.obj.getPosition())
 def _moveBin(pos):
     #call with vizschedule
     binNode.setPosition(pos)
-    while inView(common.obj_bin.obj) or inView(binNode):
-        yield viztask.waitFrame(common.SLEEP)
+    yield visibility.waitOutOfView(common.obj_bin.obj,binNode)
     viz.sendEvent(common.BIN_EVENT,pos)
     debug.log('Bin moved!')
 
@@ -689,9 +781,8 @@ mannequinToggle = viz.cycle([True,False])
 mannequin_active = False
 
 def _swapMannequin(customer,state):
-    obj = customer.avatar.avatar if state else customer.avatar.mannequin
-    while inView(obj):
-        yield viztask.waitFrame(common.SLEEP)
+    obj = customer.avatar.avatar if state else customer.avatar.mannequin
+    yield visibility.waitOutOfView(obj)
     if (state and mannequin_active) or (not state and not mannequin_active):
         debug.log('Swapping {} with mannequin: {}'.format(customer.avatar.name,state))
         viz.sendEvent(common.MANNEQUIN_EVENT,customer.avatar,state)
@@ -727,8 +818,7 @@ Poster
 posterToggle = viz.cycle(common.posters)
 
 def _swapPoster(poster):
-    while inView(poster.obj):
-        yield viztask.waitFrame(common.SLEEP)
+    yield visibility.waitOutOfView(poster.obj)
     viz.sendEvent(common.POSTER_EVENT,poster)
 
 def swapPoster(poster):
@@ -832,12 +922,19 @@ Events
 def onItemsCreated(items,*args,**kwargs):
     for object in items:
         proxyman.addTarget(object)
-    for grabber in grabbers:
-        grabber.addItems(items)
+        grid.wake(object) # Pooled items may be placed again before they leave the grid
+    grabbables.add(items)
 
+def onItemRetired(object,*args,**kwargs):
+    try:
+        proxyman.remove(object) # Added again if the item is reused
+    except:
+        pass # Already removed on delivery or expiry
+
+@tracer.span()
 def onCollideBegin(e):
     if e.obj1 in common.targetItems and e.obj2 in common.dynamicItems:
-        tbb = e.obj1.getBoundingBox()
+        tbb = bounds.getBoundingBox(e.obj1)
         # Check if dynamic object hit the top (opening) of target, or bottom if target is upside down
         if (e.pos[1] > tbb.ymax - 0.02) or (e.obj1.getEuler()[2] == 180.0 and e.pos[1] < tbb.ymin + 0.02):
             attemptDiscard(e.obj1,e.obj2)
@@ -920,7 +1017,16 @@ else:
     DebugController(mouseTracker)
 
 
+if common.POSE_STREAM:
+    if common.VIVE:
+        stream.addSource('hmd', vive.hmd.getSensor())
+        for i, controller in enumerate(vive.controllers):
+            stream.addSource('controller{}'.format(i), controller)
+    stream.addSource('mainview', viz.MainView)
+    stream.start()
+
 # Callbacks
 viz.callback(common.ASSEMBLE_EVENT, onItemsCreated)
+viz.callback(common.RETIRE_EVENT, onItemRetired)
 viz.callback(viz.COLLIDE_BEGIN_EVENT, onCollideBegin)
 viz.callback(viz.KEYDOWN_EVENT, onKeydown)
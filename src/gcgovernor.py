@@ -0,0 +1,92 @@
+"""
+Dream Cafe - GC governor module
+Version: 0.1.3
+
+The GC governor keeps Python's cyclic garbage collector out of the middle of frames. Automatic collection is
+disabled; once per frame the governor looks at the allocation counts and, if the last frame left enough slack,
+collects the youngest generation that is due. At most one collection runs per frame. The oldest generation is only
+collected in idle windows (e.g. no customers and no orders), or when it is overdue by far (FULL_FACTOR times its
+threshold), whether there is slack or not. The youngest generation is forced the same way if slack never comes.
+
+Pause durations and counts per generation are kept in getStats(), for the metrics server.
+
+"""
+
+import gc
+import viz
+from timeit import default_timer as clock
+
+FRAME_BUDGET = 1 / 90.0 #s
+SLACK = 0.7 # Collect if the last frame took less than this part of the budget
+FULL_FACTOR = 10 # Force a full collection when the oldest generation is this far over its threshold
+
+class GCGovernor(viz.EventClass):
+    def __init__(self, budget=FRAME_BUDGET):
+        viz.EventClass.__init__(self)
+        self.budget = budget
+        self.idle = lambda: False
+        self.running = False
+        self.lastTick = None
+        self.collections = [0, 0, 0]
+        self.forced = 0
+        self.pauseTotal = [0.0, 0.0, 0.0]
+        self.pauseMax = [0.0, 0.0, 0.0]
+        self.pauseLast = 0.0
+
+    def setIdleProbe(self, func):
+        # func() returns True in windows where a full collection won't be noticed
+        self.idle = func
+
+    def start(self):
+        gc.disable()
+        self.running = True
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.EXIT_EVENT, self._onExit)
+        self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+
+    def collect(self, generation):
+        t0 = clock()
+        gc.collect(generation)
+        t = clock() - t0
+        self.collections[generation] += 1
+        self.pauseTotal[generation] += t
+        self.pauseMax[generation] = max(self.pauseMax[generation], t)
+        self.pauseLast = t
+
+    def _onTimer(self, id):
+        now = clock()
+        slack = self.lastTick is not None and now - self.lastTick < self.budget * SLACK
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        generation = None
+        if counts[2] > thresholds[2] * FULL_FACTOR:
+            generation = 2
+            self.forced += 1
+        elif counts[2] > thresholds[2] and self.idle():
+            generation = 2
+        elif slack and counts[1] > thresholds[1]:
+            generation = 1
+        elif slack and counts[0] > thresholds[0]:
+            generation = 0
+        elif counts[0] > thresholds[0] * FULL_FACTOR:
+            generation = 0 # No slack for a long time, keep the young generation bounded
+            self.forced += 1
+        if generation is not None:
+            self.collect(generation)
+            now = clock() # Don't count our own pause against the next frame
+        self.lastTick = now
+
+    def _onExit(self, *args):
+        gc.enable()
+        self.running = False
+
+    def getStats(self):
+        return {
+            'collections' : list(self.collections),
+            'forced' : self.forced,
+            'pause_total' : list(self.pauseTotal),
+            'pause_max' : list(self.pauseMax),
+            'pause_last' : self.pauseLast,
+            }
+
+governor = GCGovernor()
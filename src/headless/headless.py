@@ -0,0 +1,392 @@
+"""
+Dream Cafe - Headless engine
+Version: 0.1.3
+
+Core of the headless backend. The modules in this folder (viz, vizact, viztask, vizproximity, ...) are stand-ins
+for the Vizard modules of the same name and only implement the subset that the Dream Cafe uses. They all share the
+engine below, which owns the clock, the scene, timers, coroutines and per-frame updaters.
+
+Put this folder in front of sys.path before importing common or experiment (see simulate.py).
+
+"""
+
+import sys, time, math, heapq, traceback
+
+FRAME_TIME = 1 / 90.0 # Nominal frame time (Vive refresh rate)
+WARP_FRAME_TIME = 0.1 # Longest frame in time-warp mode while per-frame work is pending
+
+""" MATH """
+
+def rotateYaw(vec, yaw):
+    # Rotate vector around the Y axis; positive yaw turns +Z towards +X (Vizard convention)
+    r = math.radians(yaw)
+    c, s = math.cos(r), math.sin(r)
+    x, y, z = vec
+    return [x*c + z*s, y, -x*s + z*c]
+
+def lookAtEuler(src, dst):
+    dx, dy, dz = [b-a for a,b in zip(src,dst)]
+    yaw = math.degrees(math.atan2(dx, dz))
+    pitch = -math.degrees(math.atan2(dy, math.hypot(dx, dz)))
+    return [yaw, pitch, 0.0]
+
+def wrapAngle(a):
+    a = (a + 180.0) % 360.0 - 180.0
+    return a
+
+
+""" SCENE DESCRIPTION """
+
+# Headless nodes carry no geometry, so known resources get a local bounding box ([center],[size]) and the names of
+# their sub-nodes. Anything unknown gets a 10cm box. Sub-nodes of the cafe are placed at their real location.
+_DEFAULT_BOX = ([0,0,0], [0.1,0.1,0.1])
+
+RESOURCES = {
+    'dreamcafe.osgb' : {
+        'box' : ([1.5,1.4,4.0], [6.0,2.8,9.0]),
+        'children' : {
+            'table01' : ([0.778,0.4,3.916], [0.5,0.8,0.8]),
+            'table09' : ([0.778,0.4,1.684], [0.5,0.8,0.8]),
+            'table02' : ([2.838,0.4,3.927], [0.5,0.8,0.8]),
+            'table07' : ([2.837,0.4,1.684], [0.5,0.8,0.8]),
+            'trayStack' : ([-0.9,0.9,6.6], [0.4,0.2,0.3]),
+            'tubTop' : ([-0.2,0.9,6.8], [0.5,0.05,0.35]),
+            'clock' : ([2.055,2.456,6.93], [0.3,0.3,0.05]),
+            'poster_kitchen' : ([-1.3,1.7,5.0], [0.02,0.8,0.6]),
+            }
+        },
+    'ordercard.osgb' : {'box' : ([0,0.05,0], [0.1,0.1,0.01])},
+    'tablecard.osgb' : {'box' : ([0,0.05,0], [0.08,0.1,0.05])},
+    'tray.osgb' : {'box' : ([0,0.01,0], [0.45,0.02,0.35])},
+    'plate.osgb' : {'box' : ([0,0.01,0], [0.2,0.02,0.2])},
+    'coffeecup.osgb' : {'box' : ([0,0.05,0], [0.09,0.1,0.09]), 'children' : {'cupCoffee' : ([0,0.09,0], [0.07,0.01,0.07])}},
+    'pie.osgb' : {'box' : ([0,0.03,0], [0.12,0.05,0.12]), 'children' : {'pie_main' : None, 'pie_consumed' : None}},
+    'bread.osgb' : {'box' : ([0,0.03,0], [0.15,0.06,0.08]), 'children' : {'bread_main' : None, 'bread_consumed' : None}},
+    'waste.osgb' : {'box' : ([0,0.03,0], [0.1,0.06,0.1])},
+    'bin.osgb' : {'box' : ([0,0.3,0], [0.4,0.6,0.4]), 'children' : {'bin01' : None}},
+    'clockhands.osgb' : {'box' : ([0,0,0], [0.3,0.3,0.02]), 'children' : {'ClockHour' : None, 'ClockMinute' : None, 'ClockSecond' : None}},
+    'mannequin_f.osgb' : {'box' : ([0,0.65,0], [0.5,1.3,0.6])},
+    'soccerball.osgb' : {'box' : ([0,0,0], [0.22,0.22,0.22])},
+    }
+
+AVATAR_BOX = ([0,0.65,0], [0.5,1.3,0.6])
+AVATAR_BONES = ['Bip01 Head', 'Bip01 Neck']
+
+def getResource(name):
+    key = name.lower()
+    if key in RESOURCES:
+        return RESOURCES[key]
+    if key.endswith('.cfg'):
+        return {'box' : AVATAR_BOX, 'bones' : AVATAR_BONES}
+    return {'box' : _DEFAULT_BOX}
+
+
+""" TIMERS """
+
+class Timer():
+    # Fires func(*args) after delay, 1+repeats times (repeats < 0 is forever). A delay <= 0 fires every frame.
+    def __init__(self, engine, delay, repeats, func, args):
+        self.engine = engine
+        self.delay = max(float(delay), 0.0)
+        self.repeats = repeats
+        self.func = func
+        self.args = args
+        self.alive = True
+        self.due = engine.time + self.delay
+
+    def perFrame(self):
+        return self.delay <= 0.0
+
+    def fire(self):
+        if self.repeats == 0:
+            self.alive = False
+        elif self.repeats > 0:
+            self.repeats -= 1
+        self.due = self.engine.time + self.delay
+        self.engine.call(self.func, *self.args)
+
+    def remove(self):
+        self.alive = False
+
+
+""" COROUTINES """
+
+class Condition():
+    # Base class for everything a task can yield
+    frameBound = False
+    def start(self, engine):
+        pass
+    def ready(self, engine):
+        return True
+    def deadline(self):
+        return None
+
+class Task():
+    def __init__(self, engine, gen):
+        self.engine = engine
+        self.stack = [gen]
+        self.waiting = None
+        self.alive = True
+        self.result = None
+
+    def kill(self):
+        self.alive = False
+        for g in self.stack:
+            try:
+                g.close()
+            except Exception:
+                pass
+        self.stack = []
+
+    def resume(self):
+        # Run until the task yields a condition that is not met yet, or finishes
+        value = None
+        while self.alive:
+            if self.waiting is not None:
+                if not self.waiting.ready(self.engine):
+                    return
+                value = getattr(self.waiting, 'value', None)
+                self.waiting = None
+            gen = self.stack[-1]
+            try:
+                cond = gen.send(value)
+            except StopIteration:
+                self.stack.pop()
+                if not self.stack:
+                    self.alive = False
+                value = None
+                continue
+            except Exception:
+                self.engine.error()
+                self.kill()
+                return
+            value = None
+            if hasattr(cond, 'send') and hasattr(cond, 'throw'):
+                self.stack.append(cond) # Sub-generator
+            else:
+                cond = cond if isinstance(cond, Condition) else WaitTask(cond)
+                cond.start(self.engine)
+                self.waiting = cond
+
+    def deadline(self):
+        return self.waiting.deadline() if self.waiting is not None else None
+
+    def frameBound(self):
+        return self.waiting is None or self.waiting.frameBound
+
+class WaitTask(Condition):
+    frameBound = True
+    def __init__(self, task):
+        self.task = task
+    def ready(self, engine):
+        return not getattr(self.task, 'alive', False)
+
+
+""" PHYSICS """
+
+class Physics():
+    def __init__(self, engine):
+        self.engine = engine
+        self.enabled = False
+        self.gravity = [0.0,-9.81,0.0]
+
+    def update(self, dt):
+        if not self.enabled:
+            return
+        for node in list(self.engine.bodies):
+            if node.removed or not node.awake or not node.physicsEnabled():
+                continue
+            v = node.velocity
+            for i in range(3):
+                v[i] += self.gravity[i] * dt
+            pos = [p + d * dt for p,d in zip(node._pos, v)]
+            floor = node.restHeight()
+            if self.gravity[1] < 0 and pos[1] <= floor:
+                pos[1] = floor
+                node.velocity = [0.0,0.0,0.0]
+                node.awake = False
+            node._pos = pos
+            node.moved()
+
+
+""" ENGINE """
+
+class Engine():
+    def __init__(self):
+        self.frame = 0
+        self.time = 0.0
+        self.frameTime = FRAME_TIME
+        self.elapsed = FRAME_TIME
+        self.realtime = False
+        self.warp = False
+        self.warpFrameTime = WARP_FRAME_TIME
+        self.started = False
+        self.errors = 0
+
+        self.nodes = set()
+        self.bodies = []
+        self.links = []
+        self.actions = []
+        self.updaters = []
+
+        self.timers = []
+        self.frameTimers = []
+        self.tasks = []
+        self.callbacks = {}
+        self.signals = {}
+        self.eventIDs = {}
+        self.physics = Physics(self)
+
+    # Events
+
+    def getEventID(self, name):
+        if name not in self.eventIDs:
+            self.eventIDs[name] = 1000 + len(self.eventIDs)
+        return self.eventIDs[name]
+
+    def addCallback(self, id, func, owner=None):
+        self.callbacks.setdefault(id, []).append((owner, func))
+
+    def setCallback(self, id, func):
+        # The global handler (owner None) of an event; EventClass handlers are kept
+        handlers = [c for c in self.callbacks.get(id, []) if c[0] is not None]
+        if func:
+            handlers.append((None, func))
+        self.callbacks[id] = handlers
+
+    def removeCallbacks(self, owner):
+        for id in self.callbacks:
+            self.callbacks[id] = [c for c in self.callbacks[id] if c[0] is not owner]
+
+    def sendEvent(self, id, *args, **kwargs):
+        for owner, func in list(self.callbacks.get(id, [])):
+            self.call(func, *args, **kwargs)
+
+    def call(self, func, *args, **kwargs):
+        # Like Vizard, a failing callback prints its traceback and the frame carries on
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            self.error()
+
+    def error(self):
+        self.errors += 1
+        traceback.print_exc()
+
+    # Timers and tasks
+
+    def addTimer(self, delay, repeats, func, *args):
+        timer = Timer(self, delay, repeats, func, args)
+        if timer.perFrame():
+            self.frameTimers.append(timer)
+        else:
+            heapq.heappush(self.timers, (timer.due, id(timer), timer))
+        return timer
+
+    def schedule(self, gen):
+        if callable(gen) and not hasattr(gen, 'send'):
+            gen = gen()
+        task = Task(self, gen)
+        self.tasks.append(task)
+        return task
+
+    def _runTimers(self):
+        for timer in list(self.frameTimers):
+            if timer.alive:
+                timer.fire()
+        self.frameTimers = [t for t in self.frameTimers if t.alive]
+        while self.timers and self.timers[0][0] <= self.time + 1e-9:
+            due, _, timer = heapq.heappop(self.timers)
+            if timer.alive:
+                timer.fire()
+                if timer.alive:
+                    heapq.heappush(self.timers, (timer.due, id(timer), timer))
+
+    def _runTasks(self):
+        for task in list(self.tasks):
+            if task.alive:
+                task.resume()
+        self.tasks = [t for t in self.tasks if t.alive]
+
+    # Frame loop
+
+    def go(self):
+        if not self.started:
+            self.started = True
+            self.sendEvent(self.getEventID('INIT_EVENT'))
+
+    def nextWakeup(self):
+        # Earliest time a timer or waiting task is due, None if nothing is scheduled
+        while self.timers and not self.timers[0][2].alive:
+            heapq.heappop(self.timers)
+        due = [self.timers[0][0]] if self.timers else []
+        due.extend([d for d in [t.deadline() for t in self.tasks] if d is not None])
+        return min(due) if due else None
+
+    def frameBound(self):
+        # True if something needs to run every frame (per-frame timers, frame waits, actions, moving bodies);
+        # warp then steps WARP_FRAME_TIME at most, so a per-frame timer that never stops disables warp
+        if self.frameTimers or self.actions:
+            return True
+        for task in self.tasks:
+            if task.frameBound():
+                return True
+        for body in self.bodies:
+            if body.awake and body.physicsEnabled():
+                return True
+        return False
+
+    def warpTime(self, end=None):
+        # Frame time that jumps straight to the next wakeup, or to a stretched frame if per-frame work is pending
+        wake = self.nextWakeup()
+        dt = self.warpFrameTime if self.frameBound() or wake is None else max(wake - self.time, self.frameTime)
+        if wake is not None:
+            dt = min(dt, max(wake - self.time, self.frameTime))
+        if end is not None:
+            dt = min(dt, max(end - self.time, 0.0))
+        return dt
+
+    def step(self, dt=None):
+        dt = self.frameTime if dt is None else dt
+        self.frame += 1
+        self.time += dt
+        self.elapsed = dt
+        self.physics.update(dt)
+        for action in list(self.actions):
+            if not action.update(dt):
+                self.actions.remove(action)
+        for link in list(self.links):
+            if link.enabled:
+                link.update()
+        for updater in list(self.updaters):
+            self.call(updater, dt)
+        self._runTimers()
+        self._runTasks()
+
+    def run(self, duration=None, frames=None):
+        # Run the frame loop at nominal frame time (in real-time or as fast as possible), or time-warped
+        self.go()
+        end = self.time + duration if duration is not None else None
+        count = 0
+        while (end is None or self.time < end - 1e-9) and (frames is None or count < frames):
+            t0 = time.time()
+            self.step(self.warpTime(end) if self.warp else None)
+            count += 1
+            if self.realtime:
+                rest = self.frameTime - (time.time() - t0)
+                if rest > 0:
+                    time.sleep(rest)
+        return count
+
+    def signal(self, *key):
+        # Input stand-in: completes viztask sensor/mouse waits for this key
+        self.signals[key] = self.signals.get(key, 0) + 1
+
+    def exit(self):
+        self.sendEvent(self.getEventID('EXIT_EVENT'))
+
+
+engine = Engine()
+
+def log(mesg):
+    sys.stderr.write('{}\n'.format(mesg))
@@ -0,0 +1,9 @@
+"""
+Dream Cafe - Headless oculus
+Version: 0.1.3
+
+Stand-in for the Vizard oculus module; only there so ruviz.river can be imported.
+
+"""
+
+RENDER_CLIENT = 'client'
@@ -0,0 +1,31 @@
+"""
+Dream Cafe - Headless steamvr
+Version: 0.1.3
+
+Stand-in for the Vizard steamvr module: an HMD sensor at standing eye height and two controllers.
+
+"""
+
+import viz
+
+BUTTON_TRIGGER = 33
+
+class Tracker(viz.VizNode):
+    def __init__(self, name, pos):
+        viz.VizNode.__init__(self, name)
+        self._pos = list(pos)
+
+    def addModel(self, parent=None, **kwargs):
+        return viz.VizNode(self.name + '_model', box=([0,0,0],[0.08,0.08,0.15]), parent=parent)
+
+class HMD():
+    def __init__(self, **kwargs):
+        self.sensor = Tracker('hmd', [0.0,1.7,0.0])
+
+    def getSensor(self):
+        return self.sensor
+
+_controllers = [Tracker('controller0', [-0.2,1.0,0.3]), Tracker('controller1', [0.2,1.0,0.3])]
+
+def getControllerList():
+    return list(_controllers)
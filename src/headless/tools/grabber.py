@@ -0,0 +1,91 @@
+"""
+Dream Cafe - Headless grabber
+Version: 0.1.3
+
+Stand-in for the Vizard tools.grabber module. Intersection is a plain distance test against item bounding boxes.
+
+"""
+
+import math
+from headless import engine
+import viz
+
+GRAB_EVENT = viz.getEventID('GRABBER_GRAB_EVENT')
+RELEASE_EVENT = viz.getEventID('GRABBER_RELEASE_EVENT')
+
+class GrabEvent():
+    def __init__(self, grabber, grabbed=None, released=None):
+        self.grabber = grabber
+        self.grabbed = grabbed
+        self.released = released
+
+class Grabber(viz.VizNode):
+    def __init__(self, usingPhysics=False, usingSprings=False, **kwargs):
+        viz.VizNode.__init__(self, 'grabber')
+        self.items = []
+        self.radius = 0.1
+        self.grabbed = None
+        self.offset = None
+        self.updateFunction = None
+        self._highlighter = None
+        engine.updaters.append(self.update)
+
+    def setItems(self, items):
+        self.items = items
+
+    def getItems(self):
+        return self.items
+
+    def addItems(self, items):
+        for item in items:
+            if item not in self.items:
+                self.items.append(item)
+
+    def removeItems(self, items):
+        for item in items:
+            if item in self.items:
+                self.items.remove(item)
+
+    def setUpdateFunction(self, func):
+        self.updateFunction = func
+
+    def getIntersection(self):
+        pos = self.getPosition(viz.ABS_GLOBAL)
+        best, bestDist = None, None
+        for item in self.items:
+            if item.removed or not item.getVisible():
+                continue
+            bb = item.getBoundingBox()
+            d = math.sqrt(sum([(a-b)**2 for a,b in zip(pos, bb.center)])) - bb.radius
+            if d <= self.radius and (best is None or d < bestDist):
+                best, bestDist = item, d
+        return best
+
+    def getGrabbed(self):
+        return self.grabbed
+
+    def isGrabbing(self):
+        return self.grabbed is not None
+
+    def grab(self):
+        item = self.getIntersection()
+        if item and not self.grabbed:
+            self.grabbed = item
+            self.offset = [a-b for a,b in zip(item.getPosition(viz.ABS_GLOBAL), self.getPosition(viz.ABS_GLOBAL))]
+            viz.sendEvent(GRAB_EVENT, GrabEvent(self, grabbed=item))
+
+    def release(self):
+        if self.grabbed:
+            item = self.grabbed
+            self.grabbed = None
+            viz.sendEvent(RELEASE_EVENT, GrabEvent(self, released=item))
+
+    def update(self, dt):
+        if self.grabbed:
+            if self.grabbed.removed:
+                self.grabbed = None
+            else:
+                pos = self.getPosition(viz.ABS_GLOBAL)
+                self.grabbed.setPosition([a+b for a,b in zip(pos, self.offset)], mode=viz.ABS_GLOBAL)
+        if self.updateFunction:
+            self.updateFunction(self)
@@ -0,0 +1,672 @@
+"""
+Dream Cafe - Headless viz
+Version: 0.1.3
+
+Stand-in for the Vizard viz module: nodes with transforms and bounding boxes, links, events, timers, physics
+state and a main view/window. Nothing is rendered; see headless.py for the engine driving it all.
+
+"""
+
+import math
+from headless import engine, getResource, rotateYaw, lookAtEuler, wrapAngle, log
+
+""" CONSTANTS """
+
+ABS_PARENT = 0
+ABS_GLOBAL = 1
+REL_PARENT = 2
+REL_LOCAL = 3
+AVATAR_LOCAL = 4
+
+PHYSICS = 'physics'
+DYNAMICS = 'dynamics'
+COLLIDE_NOTIFY = 'collide_notify'
+CULL_FACE = 'cull_face'
+LIGHTING = 'lighting'
+BLEND = 'blend'
+INTERSECTION = 'intersection'
+
+LINK_POS = 1
+LINK_ORI = 2
+LINK_ALL = LINK_POS | LINK_ORI
+
+FASTEST_EXPIRATION = 0.0
+FOREVER = -1
+
+WORLD = 'world'
+WHITE = [1.0,1.0,1.0]
+ALIGN_CENTER_CENTER = 'center_center'
+FULLSCREEN = 'fullscreen'
+SOUND_PRELOAD = 'preload'
+MOUSEBUTTON_LEFT = 1
+WINDOW_PIXELS = 'pixels'
+
+TIMER_EVENT = engine.getEventID('TIMER_EVENT')
+INIT_EVENT = engine.getEventID('INIT_EVENT')
+EXIT_EVENT = engine.getEventID('EXIT_EVENT')
+UPDATE_EVENT = engine.getEventID('UPDATE_EVENT')
+KEYDOWN_EVENT = engine.getEventID('KEYDOWN_EVENT')
+COLLIDE_BEGIN_EVENT = engine.getEventID('COLLIDE_BEGIN_EVENT')
+
+
+""" GENERAL """
+
+_options = {}
+
+def getOption(name, default=None):
+    return _options.get(name, default)
+
+def setOption(name, value):
+    _options[name] = value
+
+def setMultiSample(n):
+    pass
+
+def eyeheight(h):
+    pass
+
+def go(*args):
+    engine.go()
+
+def quit():
+    engine.exit()
+
+def tick():
+    return engine.time
+
+def getFrameNumber():
+    return engine.frame
+
+def getFrameTime():
+    return engine.time
+
+def getFrameElapsed():
+    return engine.elapsed
+
+def logNotice(*args):
+    log(' '.join([str(a) for a in args]))
+
+def logWarn(*args):
+    log(' '.join([str(a) for a in args]))
+
+def logError(*args):
+    log(' '.join([str(a) for a in args]))
+
+class cycle():
+    def __init__(self, items):
+        self.items = list(items)
+        self.index = -1
+
+    def next(self):
+        self.index = (self.index + 1) % len(self.items)
+        return self.items[self.index]
+    __next__ = next
+
+
+""" EVENTS """
+
+def getEventID(name):
+    return engine.getEventID(name)
+
+def callback(id, func):
+    # Like Vizard: one global handler per event, a new one replaces it and None removes it
+    engine.setCallback(id, func)
+
+def sendEvent(id, *args, **kwargs):
+    engine.sendEvent(id, *args, **kwargs)
+
+class EventClass():
+    def __init__(self):
+        self._timers = {}
+
+    def callback(self, id, func):
+        if id == TIMER_EVENT:
+            self._onTimer = func
+        else:
+            engine.addCallback(id, func, owner=self)
+
+    def starttimer(self, id, delay=0.0, repeats=0):
+        self.killtimer(id)
+        self._timers[id] = engine.addTimer(delay, repeats, self._fireTimer, id)
+
+    def killtimer(self, id):
+        timer = self._timers.pop(id, None)
+        if timer:
+            timer.remove()
+
+    def _fireTimer(self, id):
+        handler = getattr(self, '_onTimer', None)
+        if handler:
+            handler(id)
+
+    def unregister(self):
+        for id in list(self._timers):
+            self.killtimer(id)
+        engine.removeCallbacks(self)
+
+
+""" NODES """
+
+class BoundingBox():
+    def __init__(self, center, size):
+        self._center = list(center)
+        self._size = list(size)
+
+    @property
+    def center(self):
+        return list(self._center)
+
+    @property
+    def size(self):
+        return list(self._size)
+
+    @property
+    def radius(self):
+        return math.sqrt(sum([(s / 2.0) ** 2 for s in self._size]))
+
+    xmin = property(lambda self: self._center[0] - self._size[0] / 2.0)
+    xmax = property(lambda self: self._center[0] + self._size[0] / 2.0)
+    ymin = property(lambda self: self._center[1] - self._size[1] / 2.0)
+    ymax = property(lambda self: self._center[1] + self._size[1] / 2.0)
+    zmin = property(lambda self: self._center[2] - self._size[2] / 2.0)
+    zmax = property(lambda self: self._center[2] + self._size[2] / 2.0)
+
+class Texture():
+    def __init__(self, name):
+        self.name = name
+
+class Collider():
+    def __init__(self, type, **kwargs):
+        self.type = type
+        self.properties = dict(kwargs)
+
+    def getType(self):
+        return self.type
+
+    def setBounce(self, v):
+        self.properties['bounce'] = v
+
+    def setDensity(self, v):
+        self.properties['density'] = v
+
+    def setFriction(self, v):
+        self.properties['friction'] = v
+
+    def setHardness(self, v):
+        self.properties['hardness'] = v
+
+class Sound():
+    def __init__(self, path):
+        self.path = path
+        self.plays = 0
+
+    def play(self):
+        self.plays += 1
+
+class VizNode(object):
+    def __init__(self, name='', box=None, children=None, parent=None):
+        self.name = name
+        self.box = box if box else ([0,0,0],[0,0,0])
+        self.parent = parent if isinstance(parent, VizNode) else None
+        self.childBoxes = dict(children) if children else {}
+        self.children = {}
+        self.removed = False
+        self.collider = None
+        self.velocity = [0.0,0.0,0.0]
+        self.awake = False
+        self.actions = []
+        self._pos = [0.0,0.0,0.0]
+        self._euler = [0.0,0.0,0.0]
+        self._scale = [1.0,1.0,1.0]
+        self._visible = True
+        self._disabled = set()
+        self._texture = None
+        engine.nodes.add(self)
+
+    # Transform
+
+    def moved(self):
+        pass
+
+    def setPosition(self, pos, mode=ABS_PARENT):
+        pos = [float(p) for p in pos]
+        if mode == ABS_GLOBAL and self.parent:
+            ppos = self.parent.getPosition(ABS_GLOBAL)
+            pyaw = self.parent.getEuler(ABS_GLOBAL)[0]
+            pos = rotateYaw([a-b for a,b in zip(pos,ppos)], -pyaw)
+        self._pos = pos
+        self.moved()
+
+    def getPosition(self, mode=ABS_PARENT):
+        if mode == ABS_GLOBAL and self.parent:
+            ppos = self.parent.getPosition(ABS_GLOBAL)
+            pyaw = self.parent.getEuler(ABS_GLOBAL)[0]
+            return [a+b for a,b in zip(ppos, rotateYaw(self._pos, pyaw))]
+        return list(self._pos)
+
+    def setEuler(self, euler, mode=ABS_PARENT):
+        euler = [float(e) for e in euler]
+        if mode == ABS_GLOBAL and self.parent:
+            euler = [a-b for a,b in zip(euler, self.parent.getEuler(ABS_GLOBAL))]
+        self._euler = euler
+        self.moved()
+
+    def getEuler(self, mode=ABS_PARENT):
+        if mode == ABS_GLOBAL and self.parent:
+            return [wrapAngle(a+b) for a,b in zip(self.parent.getEuler(ABS_GLOBAL), self._euler)]
+        return list(self._euler)
+
+    def getQuat(self, mode=ABS_PARENT):
+        # [x,y,z,w] of yaw (Y), then pitch (X), then roll (Z)
+        y, p, r = [math.radians(a) / 2.0 for a in self.getEuler(mode)]
+        cy, sy, cp, sp, cr, sr = math.cos(y), math.sin(y), math.cos(p), math.sin(p), math.cos(r), math.sin(r)
+        return [cy*sp*cr + sy*cp*sr, sy*cp*cr - cy*sp*sr, cy*cp*sr - sy*sp*cr, cy*cp*cr + sy*sp*sr]
+
+    def setScale(self, scale, mode=ABS_PARENT):
+        self._scale = [float(s) for s in scale]
+        self.moved()
+
+    def getScale(self, mode=ABS_PARENT):
+        return list(self._scale)
+
+    def lookAt(self, pos, mode=ABS_PARENT):
+        self.setEuler(lookAtEuler(self.getPosition(ABS_GLOBAL), pos), mode=ABS_GLOBAL)
+
+    def getBoundingBox(self, mode=ABS_GLOBAL):
+        center, size = self.box
+        if mode == REL_LOCAL:
+            return BoundingBox(center, size)
+        scale = self.getScale()
+        size = [s*k for s,k in zip(size, scale)]
+        yaw = self.getEuler(ABS_GLOBAL)[0]
+        center = [a+b for a,b in zip(self.getPosition(ABS_GLOBAL), rotateYaw([c*k for c,k in zip(center,scale)], yaw))]
+        if abs(math.sin(math.radians(yaw))) > 0.5:
+            size = [size[2], size[1], size[0]]
+        return BoundingBox(center, size)
+
+    # Scene graph
+
+    def getChild(self, name):
+        if name not in self.children:
+            if name not in self.childBoxes:
+                logWarn('** WARNING: Could not find child node {}'.format(name))
+            box = self.childBoxes.get(name) or self.box
+            self.children[name] = VizNode(name, box=box, parent=self)
+        return self.children[name]
+
+    def getNodeNames(self):
+        return [self.name] + sorted(self.childBoxes)
+
+    def copy(self):
+        new = self.__class__.__new__(self.__class__)
+        VizNode.__init__(new, self.name, box=self.box, children=self.childBoxes, parent=self.parent)
+        new._pos = list(self._pos)
+        new._euler = list(self._euler)
+        new._scale = list(self._scale)
+        new._visible = self._visible
+        new._texture = self._texture
+        return new
+
+    def remove(self):
+        self.removed = True
+        self.actions = []
+        self.collideNone()
+        engine.nodes.discard(self)
+        for child in self.children.values():
+            child.remove()
+        for link in list(engine.links):
+            if link.src is self or link.dst is self:
+                link.remove()
+
+    # Appearance
+
+    def visible(self, state=True):
+        self._visible = bool(state)
+
+    def getVisible(self):
+        return self._visible and (self.parent is None or self.parent.getVisible())
+
+    def texture(self, tex, *args):
+        self._texture = tex
+
+    def getTexture(self):
+        return self._texture
+
+    def alpha(self, a):
+        pass
+
+    def color(self, *args):
+        pass
+
+    def emissive(self, *args):
+        pass
+
+    def zoffset(self, *args):
+        pass
+
+    def drawOrder(self, *args, **kwargs):
+        pass
+
+    def texmat(self, *args):
+        pass
+
+    def enable(self, flag):
+        self._disabled.discard(flag)
+
+    def disable(self, flag):
+        self._disabled.add(flag)
+
+    def getEnabled(self, flag):
+        return flag not in self._disabled
+
+    # Physics
+
+    def _collide(self, type, **kwargs):
+        self.collideNone()
+        self.collider = Collider(type, **kwargs)
+        engine.bodies.append(self)
+        return self.collider
+
+    def collideBox(self, *args, **kwargs):
+        return self._collide(0, **kwargs)
+
+    def collideSphere(self, *args, **kwargs):
+        return self._collide(1, **kwargs)
+
+    def collideCapsule(self, *args, **kwargs):
+        return self._collide(3, **kwargs)
+
+    def collideMesh(self, *args, **kwargs):
+        return self._collide(5, **kwargs)
+
+    def collidePlane(self, *args, **kwargs):
+        return self._collide(6, **kwargs)
+
+    def collideNone(self):
+        if self.collider:
+            self.collider = None
+            engine.bodies.remove(self)
+        return None
+
+    def physicsEnabled(self):
+        return self.collider is not None and PHYSICS not in self._disabled and DYNAMICS not in self._disabled
+
+    def restHeight(self):
+        center, size = self.box
+        return size[1] / 2.0 - center[1]
+
+    def applyForce(self, dir, duration=0.0, pos=None):
+        if not self.physicsEnabled():
+            return
+        density = self.collider.properties.get('density', 1.0)
+        size = self.box[1]
+        mass = max(density * size[0] * size[1] * size[2] * 1000.0, 0.01)
+        self.velocity = [v + f * duration / mass for v,f in zip(self.velocity, dir)]
+        self.awake = True
+
+    def getVelocity(self):
+        return list(self.velocity)
+
+    def setVelocity(self, vel):
+        self.velocity = list(vel)
+        if any(vel):
+            self.awake = True
+
+    def setAngularVelocity(self, vel):
+        pass
+
+    # Actions
+
+    def addAction(self, action, pool=0):
+        action = action.begin(self)
+        self.actions.append(action)
+        engine.actions.append(action)
+
+    def clearActions(self, pool=0):
+        for action in self.actions:
+            if action in engine.actions:
+                engine.actions.remove(action)
+        self.actions = []
+
+    # Sound
+
+    def playsound(self, path, *args):
+        return Sound(path)
+
+class VizText(VizNode):
+    def __init__(self, text, parent=None):
+        VizNode.__init__(self, 'text', box=([0,0,0],[0.1,0.1,0]), parent=parent)
+        self.text = text
+        self.messages = 0
+
+    def message(self, text):
+        self.text = text
+        self.messages += 1
+
+    def font(self, name):
+        self.fontName = name
+
+    def alignment(self, align):
+        pass
+
+class VizBone(VizNode):
+    def __init__(self, name, parent):
+        VizNode.__init__(self, name, parent=parent)
+        self.locked = False
+
+    def lock(self):
+        self.locked = True
+
+    def unlock(self):
+        self.locked = False
+
+    def setEuler(self, euler, mode=ABS_PARENT):
+        VizNode.setEuler(self, euler, mode=ABS_PARENT if mode == AVATAR_LOCAL else mode)
+
+class VizAvatar(VizNode):
+    def __init__(self, name, box=None, bones=None):
+        VizNode.__init__(self, name, box=box)
+        self.animation = None
+        self.animationSpeed = 1
+        self.bones = {}
+        for bone in bones or []:
+            b = VizBone(bone, self)
+            b._pos = [0.0,1.15,0.0]
+            self.bones[bone] = b
+
+    def state(self, anim):
+        self.animation = anim
+
+    def speed(self, speed):
+        self.animationSpeed = speed
+
+    def getState(self):
+        return self.animation
+
+    def getbone(self, name):
+        return self.bones[name]
+
+class HeadLight():
+    def disable(self):
+        pass
+
+class VizView(VizNode):
+    def __init__(self):
+        VizNode.__init__(self, 'view')
+        self._pos = [0.0,1.82,0.0]
+
+    def getHeadLight(self):
+        return HeadLight()
+
+class VizWindow():
+    def __init__(self, view):
+        self.view = view
+        self.vfov = 65.0
+        self.aspect = 16 / 9.0
+        self.size = [1600,900]
+
+    def fov(self, vfov, aspect=None):
+        self.vfov = vfov
+        if aspect:
+            self.aspect = aspect
+
+    def setSize(self, *args, **kwargs):
+        pass
+
+    def setPosition(self, *args, **kwargs):
+        pass
+
+    def getMonitorList(self):
+        return []
+
+    def isCulled(self, node):
+        # Culled when hidden or when the bounding sphere is completely outside the horizontal field of view
+        if node.removed or not node.getVisible():
+            return True
+        bb = node.getBoundingBox()
+        vpos = self.view.getPosition(ABS_GLOBAL)
+        yaw = lookAtEuler(vpos, bb.center)[0]
+        dist = max(math.sqrt(sum([(a-b)**2 for a,b in zip(vpos, bb.center)])), 1e-6)
+        spread = math.degrees(math.asin(min(bb.radius / dist, 1.0)))
+        hfov = math.degrees(math.atan(math.tan(math.radians(self.vfov / 2.0)) * self.aspect))
+        return abs(wrapAngle(yaw - self.view.getEuler(ABS_GLOBAL)[0])) > hfov + spread
+
+class VizLink():
+    def __init__(self, src, dst, mask=LINK_ALL, offset=None):
+        self.src = src
+        self.dst = dst
+        self.mask = mask
+        self.ops = []
+        self.enabled = True
+        if offset:
+            self.ops.append(('trans', list(offset)))
+        engine.links.append(self)
+        self.update()
+
+    def preTrans(self, vec):
+        self.ops.append(('trans', list(vec)))
+        self.update()
+
+    def preEuler(self, euler):
+        self.ops.append(('euler', list(euler)))
+        self.update()
+
+    def preMultLinkable(self, node):
+        self.ops.append(('pre', node))
+        self.update()
+
+    def postMultLinkable(self, node):
+        self.ops.append(('post', node))
+        self.update()
+
+    def setOffset(self, vec):
+        self.ops = [op for op in self.ops if op[0] != 'trans'] + [('trans', list(vec))]
+        self.update()
+
+    def setEnabled(self, state):
+        # Disabled links only move their destination on an explicit update()
+        self.enabled = bool(state)
+
+    def getEnabled(self):
+        return self.enabled
+
+    def update(self):
+        pos = self.src.getPosition(ABS_GLOBAL)
+        euler = self.src.getEuler(ABS_GLOBAL)
+        for op, arg in self.ops:
+            if op == 'trans':
+                pos = [a+b for a,b in zip(pos, rotateYaw(arg, euler[0]))]
+            elif op == 'euler':
+                euler = [a+b for a,b in zip(euler, arg)]
+            elif op == 'pre':
+                pos = [a+b for a,b in zip(pos, rotateYaw(arg.getPosition(ABS_GLOBAL), euler[0]))]
+                euler = [a+b for a,b in zip(euler, arg.getEuler(ABS_GLOBAL))]
+            elif op == 'post':
+                ayaw = arg.getEuler(ABS_GLOBAL)[0]
+                pos = [a+b for a,b in zip(arg.getPosition(ABS_GLOBAL), rotateYaw(pos, ayaw))]
+                euler = [a+b for a,b in zip(euler, arg.getEuler(ABS_GLOBAL))]
+        if self.mask & LINK_POS:
+            self.dst.setPosition(pos, mode=ABS_GLOBAL)
+        if self.mask & LINK_ORI:
+            self.dst.setEuler([wrapAngle(e) for e in euler], mode=ABS_GLOBAL)
+
+    def remove(self):
+        if self in engine.links:
+            engine.links.remove(self)
+
+def link(src, dst, mask=LINK_ALL, offset=None, **kwargs):
+    return VizLink(src, dst, mask=mask, offset=offset)
+
+
+""" RESOURCES """
+
+def _parent(kwargs):
+    parent = kwargs.get('parent')
+    return parent if isinstance(parent, VizNode) else None
+
+def add(name, *args, **kwargs):
+    res = getResource(name)
+    if 'bones' in res:
+        return VizAvatar(name, box=res['box'], bones=res['bones'])
+    return VizNode(name, box=res['box'], children=res.get('children'), parent=_parent(kwargs))
+
+def addChild(name, *args, **kwargs):
+    return add(name, *args, **kwargs)
+
+def addGroup(*args, **kwargs):
+    return VizNode('group', parent=_parent(kwargs))
+
+def addTexQuad(*args, **kwargs):
+    return VizNode('texquad', box=([0,0,0],[1.0,1.0,0.0]), parent=_parent(kwargs))
+
+def addText(text, *args, **kwargs):
+    return VizText(text, parent=_parent(kwargs))
+
+def addTexture(name, *args, **kwargs):
+    return Texture(name)
+
+class _Resources():
+    def __init__(self):
+        self.paths = []
+
+    def addPath(self, path):
+        self.paths.append(path)
+
+    def addPublishDirectory(self, path):
+        pass
+
+res = _Resources()
+
+
+""" PHYSICS """
+
+class _Phys():
+    def enable(self):
+        engine.physics.enabled = True
+
+    def disable(self):
+        engine.physics.enabled = False
+
+    def setGravity(self, force):
+        engine.physics.gravity = list(force)
+
+    def getGravity(self):
+        return list(engine.physics.gravity)
+
+phys = _Phys()
+
+
+""" VIEW & WINDOW """
+
+class _Mouse():
+    def setVisible(self, state):
+        pass
+
+mouse = _Mouse()
+
+MainView = VizView()
+MainWindow = VizWindow(MainView)
+window = MainWindow
+
+def fov(vfov, aspect=None):
+    MainWindow.fov(vfov, aspect)
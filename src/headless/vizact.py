@@ -0,0 +1,100 @@
+"""
+Dream Cafe - Headless vizact
+Version: 0.1.3
+
+Stand-in for the Vizard vizact module: timers and the node actions used for delivery.
+
+"""
+
+import math
+from headless import engine, wrapAngle
+import viz
+
+""" TIMERS """
+
+class EventFunction():
+    def __init__(self, timer):
+        self.timer = timer
+
+    def setEnabled(self, state):
+        if not state:
+            self.timer.remove()
+
+    def remove(self):
+        self.timer.remove()
+
+def ontimer2(rate, repeats, func, *args):
+    return EventFunction(engine.addTimer(rate, repeats, func, *args))
+
+def ontimer(rate, func, *args):
+    return EventFunction(engine.addTimer(rate, viz.FOREVER, func, *args))
+
+
+""" ACTIONS """
+
+class _Action(object):
+    # Action templates are shared; begin() returns a running instance bound to a node
+    def begin(self, node):
+        inst = self.__class__.__new__(self.__class__)
+        inst.__dict__.update(self.__dict__)
+        inst.node = node
+        return inst
+
+class _MoveTo(_Action):
+    def __init__(self, pos, speed, mode):
+        self.pos = list(pos)
+        self.speed = float(speed)
+        self.mode = mode
+
+    def update(self, dt):
+        if self.node.removed:
+            return False
+        cur = self.node.getPosition(self.mode)
+        delta = [b-a for a,b in zip(cur, self.pos)]
+        dist = math.sqrt(sum([d*d for d in delta]))
+        step = self.speed * dt
+        if dist <= step:
+            self.node.setPosition(self.pos, mode=self.mode)
+            return False
+        self.node.setPosition([a + d * step / dist for a,d in zip(cur, delta)], mode=self.mode)
+        return True
+
+class _SpinTo(_Action):
+    def __init__(self, euler, speed, mode):
+        self.euler = list(euler)
+        self.speed = float(speed)
+        self.mode = mode
+
+    def update(self, dt):
+        if self.node.removed:
+            return False
+        cur = self.node.getEuler(self.mode)
+        delta = [wrapAngle(b-a) for a,b in zip(cur, self.euler)]
+        step = self.speed * dt
+        if max([abs(d) for d in delta]) <= step:
+            self.node.setEuler(self.euler, mode=self.mode)
+            return False
+        self.node.setEuler([a + max(-step, min(step, d)) for a,d in zip(cur, delta)], mode=self.mode)
+        return True
+
+class _Parallel(_Action):
+    def __init__(self, actions):
+        self.actions = actions
+
+    def begin(self, node):
+        inst = _Action.begin(self, node)
+        inst.actions = [a.begin(node) for a in self.actions]
+        return inst
+
+    def update(self, dt):
+        self.actions = [a for a in self.actions if a.update(dt)]
+        return len(self.actions) > 0
+
+def moveTo(pos, speed=1.0, mode=viz.ABS_PARENT, **kwargs):
+    return _MoveTo(pos, speed, mode)
+
+def spinTo(euler=[0,0,0], speed=90.0, mode=viz.ABS_PARENT, **kwargs):
+    return _SpinTo(euler, speed, mode)
+
+def parallel(*actions):
+    return _Parallel(list(actions))
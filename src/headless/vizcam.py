@@ -0,0 +1,11 @@
+"""
+Dream Cafe - Headless vizcam
+Version: 0.1.3
+
+Stand-in for the Vizard vizcam module. Navigation is driven by the simulation, so this does nothing.
+
+"""
+
+class WalkNavigate():
+    def __init__(self, **kwargs):
+        self.settings = kwargs
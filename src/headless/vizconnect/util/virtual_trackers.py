@@ -0,0 +1,15 @@
+"""
+Dream Cafe - Headless virtual trackers
+Version: 0.1.3
+
+Stand-in for vizconnect.util.virtual_trackers.
+
+"""
+
+import viz
+
+class ScrollWheel(viz.VizNode):
+    def __init__(self, followMouse=False, **kwargs):
+        viz.VizNode.__init__(self, 'scrollwheel')
+        self.distance = 1.0
+        self._pos = [0.0,0.0,1.0]
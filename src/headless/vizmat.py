@@ -0,0 +1,26 @@
+"""
+Dream Cafe - Headless vizmat
+Version: 0.1.3
+
+Stand-in for the Vizard vizmat module.
+
+"""
+
+import math
+
+def Distance(a, b):
+    return math.sqrt(sum([(x-y)**2 for x,y in zip(a,b)]))
+
+class Transform():
+    def __init__(self):
+        self.scale = [1,1,1]
+        self.trans = [0,0,0]
+
+    def setScale(self, scale):
+        self.scale = list(scale)
+
+    def postTrans(self, trans):
+        self.trans = [a+b for a,b in zip(self.trans, trans)]
+
+    def preMultVec(self, vec):
+        return [v*s+t for v,s,t in zip(vec, self.scale, self.trans)]
@@ -0,0 +1,101 @@
+"""
+Dream Cafe - Headless vizproximity
+Version: 0.1.3
+
+Stand-in for the Vizard vizproximity module. Only box sensors are supported; targets are plain nodes.
+
+"""
+
+import math
+from headless import engine
+import viz
+
+class Box():
+    def __init__(self, size, center=[0,0,0]):
+        self.size = list(size)
+        self.center = list(center)
+
+    def getTest(self, source):
+        # Returns a point test for the box in its source's current frame
+        sx, sy, sz = source.getPosition(viz.ABS_GLOBAL)
+        r = math.radians(-source.getEuler(viz.ABS_GLOBAL)[0])
+        c, s = math.cos(r), math.sin(r)
+        cx, cy, cz = self.center
+        hx, hy, hz = [v / 2.0 for v in self.size]
+        def test(pos):
+            x, y, z = pos[0]-sx, pos[1]-sy, pos[2]-sz
+            return abs(x*c + z*s - cx) <= hx and abs(y - cy) <= hy and abs(-x*s + z*c - cz) <= hz
+        return test
+
+class Sensor():
+    def __init__(self, shape, source):
+        self.shape = shape
+        self.source = source
+
+class ProximityEvent():
+    def __init__(self, manager, sensor, target):
+        self.manager = manager
+        self.sensor = sensor
+        self.target = target
+
+class Manager():
+    def __init__(self):
+        self.sensors = []
+        self.targets = []
+        self.inside = set()
+        self.enterCallbacks = []
+        self.exitCallbacks = []
+        self.debug = False
+        engine.updaters.append(self.update)
+
+    def setDebug(self, state):
+        self.debug = state
+
+    def addSensor(self, sensor):
+        self.sensors.append(sensor)
+
+    def addTarget(self, target):
+        if target not in self.targets:
+            self.targets.append(target)
+
+    def removeSensor(self, sensor):
+        self.sensors.remove(sensor)
+
+    def removeTarget(self, target):
+        self.targets.remove(target)
+        for key in [k for k in self.inside if k[1] is target]:
+            self.inside.discard(key)
+
+    def remove(self, item):
+        if item in self.sensors:
+            self.removeSensor(item)
+        else:
+            self.removeTarget(item)
+
+    def onEnter(self, sensor, func, *args):
+        self.enterCallbacks.append((sensor, func, args))
+
+    def onExit(self, sensor, func, *args):
+        self.exitCallbacks.append((sensor, func, args))
+
+    def _fire(self, callbacks, sensor, target):
+        e = ProximityEvent(self, sensor, target)
+        for s, func, args in callbacks:
+            if s is None or s is sensor:
+                engine.call(func, e, *args)
+
+    def update(self, dt):
+        for target in [t for t in self.targets if t.removed]:
+            self.removeTarget(target)
+        tests = [(sensor, sensor.shape.getTest(sensor.source)) for sensor in self.sensors]
+        for target in list(self.targets):
+            pos = target.getPosition(viz.ABS_GLOBAL)
+            for sensor, test in tests:
+                key = (sensor, target)
+                inside = test(pos)
+                if inside and key not in self.inside:
+                    self.inside.add(key)
+                    self._fire(self.enterCallbacks, sensor, target)
+                elif not inside and key in self.inside:
+                    self.inside.discard(key)
+                    self._fire(self.exitCallbacks, sensor, target)
@@ -0,0 +1,18 @@
+"""
+Dream Cafe - Headless vizshape
+Version: 0.1.3
+
+Stand-in for the Vizard vizshape module.
+
+"""
+
+import viz
+
+AXIS_X = 0
+AXIS_Y = 1
+AXIS_Z = 2
+
+def addQuad(size=[1.0,1.0], axis=AXIS_Z, **kwargs):
+    w, h = size
+    dims = {AXIS_X : [0.0,h,w], AXIS_Y : [w,0.0,h], AXIS_Z : [w,h,0.0]}[axis]
+    return viz.VizNode('quad', box=([0,0,0],dims), parent=kwargs.get('parent'))
@@ -0,0 +1,85 @@
+"""
+Dream Cafe - Headless viztask
+Version: 0.1.3
+
+Stand-in for the Vizard viztask module. Tasks are plain generators resumed by the headless engine every frame.
+Input waits (sensor, mouse) only complete when the matching signal is sent with engine.signal().
+
+"""
+
+from headless import engine, Condition
+
+def schedule(task):
+    return engine.schedule(task)
+
+class _WaitTime(Condition):
+    def __init__(self, t):
+        self.t = float(t)
+
+    def start(self, engine):
+        self.due = engine.time + self.t
+
+    def ready(self, engine):
+        return engine.time >= self.due - 1e-9
+
+    def deadline(self):
+        return self.due
+
+class _WaitFrame(Condition):
+    frameBound = True
+    def __init__(self, n):
+        self.n = n
+
+    def start(self, engine):
+        self.due = engine.frame + self.n
+
+    def ready(self, engine):
+        return engine.frame >= self.due
+
+class _WaitSignal(Condition):
+    def __init__(self, *key):
+        self.key = key
+
+    def start(self, engine):
+        self.count = engine.signals.get(self.key, 0)
+
+    def ready(self, engine):
+        return engine.signals.get(self.key, 0) > self.count
+
+class _WaitSignalObject(Condition):
+    def __init__(self, signal):
+        self.signal = signal
+
+    def start(self, engine):
+        self.count = self.signal.count
+
+    def ready(self, engine):
+        return self.signal.count > self.count
+
+class Signal():
+    def __init__(self):
+        self.count = 0
+
+    def send(self, *args):
+        self.count += 1
+
+    def wait(self):
+        return _WaitSignalObject(self)
+
+def waitTime(t):
+    return _WaitTime(t)
+
+def waitFrame(n):
+    return _WaitFrame(n)
+
+def waitSensorDown(sensor, button):
+    return _WaitSignal('sensordown', id(sensor), button)
+
+def waitSensorUp(sensor, button):
+    return _WaitSignal('sensorup', id(sensor), button)
+
+def waitMouseDown(button):
+    return _WaitSignal('mousedown', button)
+
+def waitMouseUp(button):
+    return _WaitSignal('mouseup', button)
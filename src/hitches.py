@@ -0,0 +1,88 @@
+"""
+Dream Cafe - Hitches module
+Version: 0.1.3
+
+The hitches module watches frame times. At 90 Hz a frame over ~11 ms is visible in the headset, so every such frame
+is a hitch. Each hitch is logged (ruviz.data EventLogger, data/hitches_<timestamp>.csv) with the experiment events
+dispatched in that frame, the number of live coroutines and the number of dynamic items, so hitches can be lined
+up with the autoEvents choices of many sessions. A rolling histogram of the last frames is logged on exit.
+
+Frame times are wall-clock times between two consecutive frames; the detector's timer runs once per frame.
+
+"""
+
+import viz
+from timeit import default_timer as clock
+from ruviz import data
+import common
+from coroutines import coroutines
+
+HITCH_TIME = 0.011 #s
+ROLLING_FRAMES = 900 # ~10s at 90 Hz
+BIN_SIZE = 0.001 #s
+BIN_COUNT = 50 # Last bin collects everything from 49 ms up
+EVENTS = ['START_EVENT','ORDER_EVENT','ASSEMBLE_EVENT','DELIVER_EVENT','EXPIRE_EVENT','GARBAGE_EVENT','DISCARD_EVENT',
+    'CUSTOMER_ENTER_EVENT','CUSTOMER_LEAVE_EVENT','GRAVITY_EVENT','SHUFFLE_CARDS_EVENT','BIN_EVENT','STARE_EVENT',
+    'MANNEQUIN_EVENT','WASTE_EVENT','POSTER_EVENT'] # common events worth attributing; not CLOCK_EVENT, it fires every second
+
+class FrameHistogram():
+    # Histogram over the last frames; a ring of bin indices is kept so old frames can be taken out again
+    def __init__(self, frames=ROLLING_FRAMES):
+        self.bins = [0] * BIN_COUNT
+        self.ring = [None] * frames
+        self.head = 0
+
+    def add(self, t):
+        i = min(int(t / BIN_SIZE), BIN_COUNT - 1)
+        old = self.ring[self.head]
+        if old is not None:
+            self.bins[old] -= 1
+        self.ring[self.head] = i
+        self.head = (self.head + 1) % len(self.ring)
+        self.bins[i] += 1
+
+class HitchDetector(viz.EventClass):
+    def __init__(self, threshold=HITCH_TIME):
+        viz.EventClass.__init__(self)
+        self.threshold = threshold
+        self.histogram = FrameHistogram()
+        self.events = []
+        self.hitches = 0
+        self.frames = 0
+        self.lastTick = None
+        self.logger = None
+
+    def start(self):
+        coroutines.install()
+        for name in EVENTS:
+            self.callback(getattr(common, name), self._recorder(name)) # Next to the app's handlers, not instead of them
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.EXIT_EVENT, self._onExit) # Before the logger closes its file on exit
+        self.logger = data.EventLogger('hitches')
+        self.logger.logHeader('frame', 'frame_ms', 'events', 'coroutines', 'dynamic_items')
+        self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+
+    def _recorder(self, name):
+        label = name[:-len('_EVENT')].lower()
+        def _record(*args, **kwargs):
+            self.events.append(label)
+        return _record
+
+    def _onTimer(self, id):
+        # Runs once per frame; the events recorded since the last run belong to the frame that just ended
+        now = clock()
+        if self.lastTick is not None:
+            t = now - self.lastTick
+            self.frames += 1
+            self.histogram.add(t)
+            if t > self.threshold:
+                self.hitches += 1
+                self.logger.log('hitch', viz.getFrameNumber() - 1, round(t * 1000, 2), ' '.join(self.events), coroutines.count(), len(common.dynamicItems))
+        self.lastTick = now
+        self.events = []
+
+    def _onExit(self, *args):
+        self.logger.log('summary', self.frames, self.hitches)
+        self.logger.log('histogram_ms', *self.histogram.bins)
+
+detector = HitchDetector()
@@ -0,0 +1,81 @@
+"""
+Dream Cafe - LCD atlas module
+Version: 0.1.3
+
+The LCD atlas module pre-renders the two-digit values 00-59 of the digital clock font into one texture, so the clock
+can show a value by moving its texture coordinates instead of laying out text. Cells are laid out 10 per row,
+value v in column v % 10 and row v // 10, counted from the top.
+
+Rendering is deterministic (fixed cell size, font size and integer glyph positions) and cached on disk, keyed by a
+hash of the font file and the settings; a startup only renders when the cache is missing. Rendering needs PIL;
+without it getAtlas() returns None and the clock falls back to text nodes.
+
+Usage: python lcdatlas.py  (renders the cache offline)
+
+"""
+
+import os, hashlib
+from ruviz import utils
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+FONT = utils.getPath('res', 'fonts', 'digital-7m.ttf')
+CACHE = utils.getPath('cache')
+COLUMNS = 10
+ROWS = 6
+CELL = (128, 96) #px
+FONT_SIZE = 88 #px
+VERSION = 2 # Bump when the rendering changes
+
+def _key(font):
+    h = hashlib.sha1()
+    with open(font, 'rb') as f:
+        h.update(f.read())
+    h.update(repr((VERSION, COLUMNS, ROWS, CELL, FONT_SIZE, getattr(Image, 'VERSION', None) or Image.__version__)))
+    return h.hexdigest()[:16]
+
+def _extent(draw, text, face):
+    # Left, top, width and height of the ink; textsize() is gone since Pillow 10, textbbox() came in 8
+    if hasattr(draw, 'textbbox'):
+        l, t, r, b = draw.textbbox((0, 0), text, font=face)
+        return l, t, r - l, b - t
+    w, h = draw.textsize(text, font=face)
+    return 0, 0, w, h
+
+def drawCell(draw, face, v, x, y):
+    # Value v centred on its ink in the cell with top left corner x, y
+    text = '{:02d}'.format(v)
+    l, t, w, h = _extent(draw, text, face)
+    draw.text((x + (CELL[0] - w) // 2 - l, y + (CELL[1] - h) // 2 - t), text, font=face, fill=(255, 255, 255, 255))
+
+def render(font, path):
+    face = ImageFont.truetype(font, FONT_SIZE)
+    atlas = Image.new('RGBA', (CELL[0] * COLUMNS, CELL[1] * ROWS), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(atlas)
+    for v in range(COLUMNS * ROWS):
+        drawCell(draw, face, v, (v % COLUMNS) * CELL[0], (v // COLUMNS) * CELL[1])
+    tmp = path + '.tmp'
+    atlas.save(tmp, 'PNG', optimize=False)
+    os.rename(tmp, path) # Never leave half a cache file behind
+
+def getAtlas(font=FONT, cache=CACHE):
+    # Path of the cached atlas, rendered first if needed; None without PIL
+    if Image is None:
+        return None
+    path = os.path.join(cache, 'lcd_{}.png'.format(_key(font)))
+    if not os.path.exists(path):
+        if not os.path.isdir(cache):
+            os.makedirs(cache)
+        render(font, path)
+    return path
+
+def getCell(v):
+    # Texture offset and scale of value v, with v counted from the bottom like texture coordinates
+    col, row = v % COLUMNS, v // COLUMNS
+    return [col / float(COLUMNS), 1.0 - (row + 1) / float(ROWS)], [1.0 / COLUMNS, 1.0 / ROWS]
+
+if __name__ == '__main__':
+    print(getAtlas() or 'PIL is not available')
@@ -0,0 +1,75 @@
+"""
+Dream Cafe - Metrics module
+Version: 0.1.3
+
+The metrics module serves live counters as Prometheus text (http://<host>:<port>/metrics), so load can be watched
+without touching the VR PC. It binds to localhost by default (d_metricshost "127.0.0.1"); set d_metricshost to
+"0.0.0.0" or the PC's address to let a scraper on another machine read it.
+
+Gauges are read on the render thread a few times per second and rendered into a text snapshot; the HTTP server runs
+on a background thread and only ever hands out the latest snapshot, so a slow or stuck client can't block a frame.
+Modules add their own gauges with addGauge().
+
+"""
+
+import threading
+import BaseHTTPServer
+import viz
+from coroutines import coroutines
+
+METRICS_TIME = 0.5 #s
+PREFIX = 'dreamcafe_'
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ['/', '/metrics']:
+            self.send_error(404)
+            return
+        body = self.server.snapshot
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass # Keep the console quiet
+
+class MetricsServer(viz.EventClass):
+    def __init__(self, interval=METRICS_TIME):
+        viz.EventClass.__init__(self)
+        self.interval = interval
+        self.gauges = []
+        self.server = None
+        self.thread = None
+
+    def addGauge(self, name, help, func):
+        self.gauges.append((PREFIX + name, help, func))
+
+    def start(self, port, host='127.0.0.1'):
+        coroutines.install()
+        self.server = BaseHTTPServer.HTTPServer((host, port), _Handler)
+        self.server.snapshot = ''
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.EXIT_EVENT, self._onExit)
+        self.starttimer(0, self.interval, viz.FOREVER)
+
+    def render(self):
+        lines = []
+        for name, help, func in self.gauges:
+            lines.append('# HELP {} {}'.format(name, help))
+            lines.append('# TYPE {} gauge'.format(name))
+            lines.append('{} {}'.format(name, float(func())))
+        return '\n'.join(lines) + '\n'
+
+    def _onTimer(self, id):
+        self.server.snapshot = self.render() # Swapping the reference is atomic
+
+    def _onExit(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+metrics = MetricsServer()
@@ -0,0 +1,92 @@
+"""
+Dream Cafe - Poses module
+Version: 0.1.3
+
+The poses module describes the shared-memory pose stream written by posestream, and reads it. It only needs the
+standard library, so recorders, eye-tracking sync or analysis scripts can import it in their own process (plain
+Python, no Vizard) and read the stream straight from the memory-mapped file at full rate.
+
+Layout (little-endian):
+    header  magic '4s', version 'I', slot count 'I', source count 'I', latest sequence 'Q', source names 16s each
+    slots   sequence 'Q', frame 'I', time 'd', then per source position 3f and quaternion 4f (x,y,z,w)
+
+Sequence numbers start at 1; record n is in slot (n-1) % slot count. The writer zeroes a slot's sequence before
+filling it, sets it last and then updates the latest sequence in the header. A reader checks that the slot holds the
+sequence it expects before and after copying it.
+
+Usage: python poses.py [PATH]  (prints the stream)
+
+"""
+
+import os, sys, mmap, struct, tempfile, time
+
+MAGIC = b'DCPS'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIQ')
+NAME = struct.Struct('<16s')
+SLOT_HEAD = struct.Struct('<QId')
+SEQ = struct.Struct('<Q')
+POSE = struct.Struct('<7f')
+SLOTS = 512 # ~5.7s at 90 Hz
+PATH = os.path.join(tempfile.gettempdir(), 'dreamcafe_poses.bin')
+
+def slotSize(sources):
+    return SLOT_HEAD.size + POSE.size * sources
+
+def fileSize(sources, slots=SLOTS):
+    return HEADER.size + NAME.size * sources + slotSize(sources) * slots
+
+class PoseReader():
+    def __init__(self, path=PATH):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, count, latest = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise IOError('{} is not a version {} pose stream'.format(path, VERSION))
+        self.sources = [NAME.unpack_from(self.map, HEADER.size + NAME.size * i)[0].rstrip(b'\0').decode('ascii') for i in range(count)]
+        self.base = HEADER.size + NAME.size * count
+        self.size = slotSize(count)
+        self.next = latest + 1 if latest else 1
+
+    def latest(self):
+        return HEADER.unpack_from(self.map, 0)[4]
+
+    def read(self, seq):
+        # Record {'seq','frame','time',source:(pos,quat)} or None if it was overwritten or isn't complete
+        offset = self.base + ((seq - 1) % self.slots) * self.size
+        if SLOT_HEAD.unpack_from(self.map, offset)[0] != seq:
+            return None
+        raw = self.map[offset:offset + self.size]
+        if SLOT_HEAD.unpack_from(self.map, offset)[0] != seq:
+            return None
+        s, frame, t = SLOT_HEAD.unpack_from(raw, 0)
+        record = {'seq':s, 'frame':frame, 'time':t}
+        for i, name in enumerate(self.sources):
+            pose = POSE.unpack_from(raw, SLOT_HEAD.size + POSE.size * i)
+            record[name] = (pose[:3], pose[3:])
+        return record
+
+    def poll(self):
+        # All new records since the last poll; skips ahead if the reader fell more than a ring behind
+        latest = self.latest()
+        if latest - self.next >= self.slots:
+            self.next = latest - self.slots + 1
+        records = []
+        while self.next <= latest:
+            record = self.read(self.next)
+            if record:
+                records.append(record)
+            self.next += 1
+        return records
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+if __name__ == '__main__':
+    reader = PoseReader(sys.argv[1] if len(sys.argv) > 1 else PATH)
+    print('Sources: {}'.format(', '.join(reader.sources)))
+    while True:
+        for record in reader.poll():
+            print('{seq} {frame} {time:.4f} '.format(**record) + ' '.join(['{}={:.3f},{:.3f},{:.3f}'.format(n, *record[n][0]) for n in reader.sources]))
+        time.sleep(0.005)
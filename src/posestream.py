@@ -0,0 +1,60 @@
+"""
+Dream Cafe - Pose stream module
+Version: 0.1.3
+
+The pose stream module publishes head, controller and view poses every frame into a memory-mapped ring buffer, for
+recorders in other processes (see poses for the layout and a reader). Writing a frame is a few struct.pack_into
+calls into the map; there are no locks, readers check sequence numbers instead.
+
+"""
+
+import mmap
+import viz
+import poses
+
+class PoseStream(viz.EventClass):
+    def __init__(self):
+        viz.EventClass.__init__(self)
+        self.sources = []
+        self.map = None
+        self.seq = 0
+
+    def addSource(self, name, node):
+        self.sources.append((name, node))
+
+    def start(self, path=poses.PATH, slots=poses.SLOTS):
+        count = len(self.sources)
+        size = poses.fileSize(count, slots)
+        self.file = open(path, 'w+b')
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        poses.HEADER.pack_into(self.map, 0, poses.MAGIC, poses.VERSION, slots, count, 0)
+        for i, (name, node) in enumerate(self.sources):
+            poses.NAME.pack_into(self.map, poses.HEADER.size + poses.NAME.size * i, name.encode('ascii'))
+        self.base = poses.HEADER.size + poses.NAME.size * count
+        self.size = poses.slotSize(count)
+        self.slots = slots
+
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.EXIT_EVENT, self._onExit)
+        self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+
+    def _onTimer(self, id):
+        self.seq += 1
+        offset = self.base + ((self.seq - 1) % self.slots) * self.size
+        poses.SLOT_HEAD.pack_into(self.map, offset, 0, viz.getFrameNumber(), viz.tick()) # Sequence 0: being written
+        pose = offset + poses.SLOT_HEAD.size
+        for name, node in self.sources:
+            pos = node.getPosition(viz.ABS_GLOBAL)
+            quat = node.getQuat(viz.ABS_GLOBAL)
+            poses.POSE.pack_into(self.map, pose, pos[0], pos[1], pos[2], quat[0], quat[1], quat[2], quat[3])
+            pose += poses.POSE.size
+        poses.SEQ.pack_into(self.map, offset, self.seq)
+        poses.HEADER.pack_into(self.map, 0, poses.MAGIC, poses.VERSION, self.slots, len(self.sources), self.seq)
+
+    def _onExit(self, *args):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+stream = PoseStream()
@@ -0,0 +1,128 @@
+"""
+Dream Cafe - Registry module
+Version: 0.1.3
+
+The registry module holds the containers that track physics items. Collision callbacks test membership for every
+contact and discarded items are removed one by one, so membership, adding and removing are all constant time.
+
+ItemSet keeps insertion order, so iterating over it visits items in the order they were spawned.
+ItemRegistry maps nodes to the PhysicsObject that wraps them.
+GrabbableSet is the one set of grabbable items shared by all grabbers.
+
+"""
+
+import viz
+from collections import OrderedDict
+
+class ItemSet():
+    def __init__(self, items=()):
+        self.items = OrderedDict()
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        self.items[item] = None
+
+    def discard(self, item):
+        self.items.pop(item, None)
+
+    def remove(self, item):
+        del self.items[item]
+
+    def clear(self):
+        self.items.clear()
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        # Iterate over a snapshot, callers may add or discard items on the way
+        return iter(self.items.keys())
+
+class ItemRegistry():
+    def __init__(self):
+        self.items = {} # node: PhysicsObject
+
+    def register(self, item):
+        self.items[item.obj] = item
+
+    def unregister(self, node):
+        return self.items.pop(node, None)
+
+    def get(self, node, default=None):
+        return self.items.get(node, default)
+
+    def __getitem__(self, node):
+        return self.items[node]
+
+    def __contains__(self, node):
+        return node in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items.keys())
+
+class GrabbableSet(viz.EventClass):
+    # Items all grabbers can pick up. Changes are collected and applied once per frame, subscribers get the
+    # batched deltas and the new version number.
+    def __init__(self):
+        viz.EventClass.__init__(self)
+        self.items = ItemSet()
+        self.version = 0
+        self.pending = OrderedDict() # node: True (add) or False (remove)
+        self.subscribers = []
+        self.running = False
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+
+    def subscribe(self, func):
+        # func(added, removed, version)
+        self.subscribers.append(func)
+
+    def add(self, items):
+        self._queue(items, True)
+
+    def remove(self, items):
+        self._queue(items, False)
+
+    def _queue(self, items, state):
+        for item in items:
+            self.pending.pop(item, None) # Keep the latest change in order
+            self.pending[item] = state
+        if self.pending and not self.running:
+            self.running = True
+            self.starttimer(0, viz.FASTEST_EXPIRATION)
+
+    def isGrabbable(self, item):
+        # Pending removals are excluded right away
+        return item in self.items and self.pending.get(item) is not False
+
+    def _onTimer(self, id):
+        self.running = False
+        added = []
+        removed = []
+        for item, state in self.pending.items():
+            if state and item not in self.items:
+                self.items.add(item)
+                added.append(item)
+            elif not state and item in self.items:
+                self.items.discard(item)
+                removed.append(item)
+        self.pending.clear()
+        if added or removed:
+            self.version += 1
+            for func in self.subscribers:
+                func(added, removed, self.version)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
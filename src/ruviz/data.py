@@ -16,7 +16,7 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 
 """
 
-import viz, csv, time, utils
+import viz, csv, time, os, utils
 
 _datafolder = utils.getPath('data')
 
@@ -27,7 +27,9 @@ class _AbstractLogger(viz.EventClass):
         self.init_time = viz.tick()
         timestamp = time.strftime('%Y%m%d%H%M', time.localtime())
 
-        f = '{0}\\{1}_{2}.csv'.format(path,filename,timestamp)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        f = os.path.join(path,'{0}_{1}.csv'.format(filename,timestamp))
         self.file = open(f, 'wb')
         self.writer = csv.writer(self.file,delimiter=delimiter)
 
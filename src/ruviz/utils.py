@@ -14,7 +14,7 @@ THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLI
 
 """
 
-import viz, os, re, shlex
+import viz, os, re, shlex, hashlib, cPickle
 
 """ GENERAL """
 
@@ -132,42 +132,206 @@ def getKeyCode(key):
 
 _cfgfolder = getPath('cfg')
 
+PROFILE_ORDER = ['default', 'user'] # Later files override earlier ones; other .cfg files follow alphabetically
+CACHE_VERSION = 2
+
+class ConfigError(Exception):
+    pass
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
 class Config():
-    def __init__(self, dir=_cfgfolder, profile=[]):
+    # With a schema ({key: type or (type, subtype)}) every value is converted once at load: keys in the files that
+    # the schema doesn't know are reported, keys it expects that no file sets raise ConfigError. The parsed files are
+    # cached in cache/ next to the config folder and reused while their mtimes (or else their hashes) match.
+    # reload() re-parses only the files that changed since and returns the values that changed.
+    overrides = {} # Raw values applied over the files, e.g. per simulated run; never cached
+
+    def __init__(self, dir=_cfgfolder, profile=[], schema=None, cache=True):
         self.cfg = {}
-        self.dir = dir
+        self.values = {}
+        self.schema = schema
+        self.files = {}     # path: (stamp, digest, {key: (raw, line)})
+        self.order = []     # Paths of the files, in the order they are applied
+        self.built = None   # (cfg, values, unknown) of the files, before overrides
+        self.touched = False
+        self.cachePath = self._cachePath(dir, profile) if cache else None
         self.load(dir,profile)
 
-    def _loadConfig(self, path):
-        try:
-            cf = open(path, 'r')
-            cl = cf.readlines()
-            cf.close()
-        except IOError:
-            raise
-        else:
-            for i, c in enumerate(cl):
-                s = shlex.split(c)[:3] if not c.startswith('//') else []
-                if len(s):
-                    if s[0] == 'bind':
-                        self.cfg[s[2]] = getKeyCode(s[1])
-                    elif s[0] == 'seta':
-                        self.cfg[s[1]] = s[2]
-                    else:
-                        viz.logWarn('** WARNING: CFG Read Error in line {}'.format(i+1))
+    def _cachePath(self, dir, profile):
+        root = os.path.dirname(os.path.abspath(dir))
+        name = 'config_{}.pickle'.format(_digest(repr((os.path.abspath(dir), profile)))[:8])
+        return os.path.join(root, 'cache', name)
 
+    def _loadConfig(self, path, known=None):
+        # Returns (digest, {key: (raw, line)}); a known (digest, entries) is returned as is if the contents match
+        with open(path, 'rb') as cf:
+            data = cf.read()
+        digest = _digest(data)
+        if known and known[0] == digest:
+            return known
+        entries = {}
+        for i, c in enumerate(data.splitlines()):
+            s = shlex.split(c)[:3] if not c.startswith('//') else []
+            if len(s):
+                if s[0] == 'bind':
+                    entries[s[2]] = (getKeyCode(s[1]), i+1)
+                elif s[0] == 'seta':
+                    entries[s[1]] = (s[2], i+1)
+                else:
+                    viz.logWarn('** WARNING: CFG Read Error in line {}'.format(i+1))
+        return digest, entries
 
-    def load(self, dir, profile):
+    def paths(self, dir, profile):
         profiles = [profile] if not isinstance(profile, (list,tuple)) else profile
         if profiles:
-            paths = ['{}.cfg'.format(p) for p in profiles]
+            names = ['{}.cfg'.format(p) for p in profiles]
         else:
-            paths = [f for f in os.listdir(dir) if f.endswith('.cfg')]
-        for p in paths:
+            files = sorted([f for f in os.listdir(dir) if f.endswith('.cfg')])
+            names = [n for n in ['{}.cfg'.format(p) for p in PROFILE_ORDER] if n in files]
+            names += [f for f in files if f not in names]
+        return [os.path.join(dir,n) for n in names]
+
+    def _stamp(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime, st.st_size)
+
+    def stamps(self):
+        # Stamps of the config files as they are now; only stats files, so it can be polled from any thread
+        return [(p, self._stamp(p)) for p in self.paths(self.dir, self.profile)]
+
+    def _scan(self):
+        # Re-parses the files whose stamp changed; True if the contents or the set of files changed
+        self.order = self.paths(self.dir, self.profile)
+        changed = [p for p in self.files if p not in self.order]
+        for p in changed:
+            del self.files[p]
+        for p in self.order:
+            stamp = self._stamp(p)
+            known = self.files.get(p)
+            if known and known[0] == stamp:
+                continue
             try:
-                self._loadConfig('\\'.join([dir,p]))
-            except:
-                viz.logWarn('** WARNING: Failed to load file {}'.format(p))
+                digest, entries = self._loadConfig(p, known[1:] if known else None)
+            except (IOError, ValueError):
+                viz.logWarn('** WARNING: Failed to load file {}'.format(os.path.basename(p)))
+                stamp, digest, entries = None, None, {} # Retried on the next scan
+            if not known or known[1] != digest:
+                changed.append(p)
+            self.files[p] = (stamp, digest, entries)
+            self.touched = True
+        if changed:
+            self.touched = True
+        return bool(changed)
+
+    def _build(self):
+        cfg, origins = {}, {}
+        for p in self.order:
+            for key, (raw, line) in self.files[p][2].items():
+                cfg[key] = raw
+                origins[key] = (os.path.basename(p), line)
+        unknown = sorted([(origins[k][0], origins[k][1], k) for k in cfg if self.schema is not None and k not in self.schema])
+        return cfg, self._compile(cfg), unknown
+
+    def _apply(self):
+        cfg, values, unknown = self.built
+        for name, line, key in unknown:
+            viz.logError('** ERROR: Unknown config key "{}" in {} line {}'.format(key, name, line))
+        cfg, values = dict(cfg), dict(values)
+        for key, raw in self.overrides.items():
+            cfg[key] = raw
+            if self.schema is not None:
+                if key not in self.schema:
+                    raise ConfigError('Override of unknown config key "{}"'.format(key))
+                values[key] = self._typed(key, raw)
+        self.cfg, self.values = cfg, values
+
+    def load(self, dir, profile):
+        self.dir = dir
+        self.profile = profile
+        self.built = self._readCache()
+        if self._scan() or self.built is None:
+            self.built = self._build()
+        self._writeCache()
+        self._apply()
+
+    def reload(self):
+        # Re-parses the files that changed; returns {key: (old, new)} for every value that changed.
+        # Raises ConfigError if the files became invalid, and keeps the values it had.
+        if not self._scan():
+            self._writeCache()
+            return {}
+        try:
+            built = self._build()
+        except ConfigError:
+            self.files = {} # Parse everything again once the files are fixed
+            raise
+        old = self.values if self.schema is not None else self.cfg
+        self.built = built
+        self._writeCache()
+        self._apply()
+        new = self.values if self.schema is not None else self.cfg
+        return dict([(k, (old.get(k), new.get(k))) for k in set(old) | set(new) if old.get(k) != new.get(k)])
+
+    def _schemaDigest(self):
+        return _digest(repr(sorted(self.schema.items()))) if self.schema is not None else None
+
+    def _readCache(self):
+        # Cached (cfg, values, unknown), with the parsed files put back, or None if there is no matching cache
+        if not self.cachePath or not os.path.exists(self.cachePath):
+            return None
+        try:
+            with open(self.cachePath, 'rb') as f:
+                c = cPickle.load(f)
+            if c['version'] != CACHE_VERSION or c['schema'] != self._schemaDigest() or c['order'] != self.paths(self.dir, self.profile):
+                return None
+        except Exception: # Unreadable or from an older version: parse again
+            return None
+        self.files = c['files']
+        return c['built']
+
+    def _writeCache(self):
+        if not self.cachePath or not self.touched:
+            return
+        try:
+            folder = os.path.dirname(self.cachePath)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            tmp = self.cachePath + '.tmp'
+            with open(tmp, 'wb') as f:
+                cPickle.dump({
+                    'version' : CACHE_VERSION,
+                    'schema' : self._schemaDigest(),
+                    'order' : self.order,
+                    'files' : self.files,
+                    'built' : self.built,
+                    }, f, 2)
+            if os.path.exists(self.cachePath):
+                os.remove(self.cachePath)
+            os.rename(tmp, self.cachePath)
+            self.touched = False
+        except (IOError, OSError):
+            pass # The cache only saves parsing; without it every load parses
+
+    def _compile(self, raw):
+        if self.schema is None:
+            return {}
+        missing = sorted([k for k in self.schema if k not in raw])
+        if missing:
+            raise ConfigError('Missing config keys in {}: {}'.format(self.dir, ', '.join(missing)))
+        return dict([(k, self._typed(k, raw[k])) for k in self.schema])
+
+    def _typed(self, item, raw):
+        spec = self.schema[item]
+        args = (spec,) if isinstance(spec, basestring) else spec
+        try:
+            return self._resolve(raw, *args)
+        except ValueError:
+            raise ConfigError('Config key "{}" = "{}" is not of type {}'.format(item, raw, ' '.join(args)))
 
     def _convert(self,raw,type):
         if type == 'bool':
@@ -184,18 +348,25 @@ class Config():
         else:
             return raw
 
+    def _resolve(self, raw, *args):
+        t = args[0] if args else ''
+        output = self._convert(raw,t)
+        if t == 'list' and len(args) > 1:
+            st = args[1]
+            for i, sr in enumerate(output):
+                output[i] = self._convert(sr,st)
+        return output
+
     def get(self, item, *args):
         # get value from config, as predefined type (optional) and subtype (optional, if type is list). Default type is string.
+        # With a schema the value was converted at load and the type arguments are ignored.
+        if self.schema is not None:
+            if item not in self.values:
+                raise ConfigError('"{}" is not in the config schema'.format(item))
+            value = self.values[item]
+            return list(value) if isinstance(value, list) else value
         try:
-            raw = self.cfg[item]
-            t = args[0] if args else ''
-            output = self._convert(raw,t)
-            if t == 'list' and len(args) > 1:
-                st = args[1]
-                for i, sr in enumerate(output):
-                    output[i] = self._convert(sr,st)
-            return output
-
+            return self._resolve(self.cfg[item], *args)
         except KeyError:
             viz.logError('** ERROR: "{}" not found in config'.format(item))
             return None
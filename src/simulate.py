@@ -0,0 +1,213 @@
+"""
+Dream Cafe - Simulate module
+Version: 0.1.3
+
+The simulate module runs the unchanged experiment logic on the headless backend (see headless/), so customers,
+orders, expiry and gravity can be profiled and load-tested without Vizard or a GPU.
+
+In time-warp mode the clock jumps straight to the next timer or task wakeup, so a full session takes seconds.
+Anything that runs every frame (a FASTEST_EXPIRATION timer, a frame wait, an action or a moving body) holds warp
+to short frames while it runs, so modules only keep per-frame timers while they have per-frame work;
+tests/test_headless.py checks that an idle experiment still jumps.
+Config values can be overridden per run (--set t_expiration=30) or swept across runs (--sweep t_expiration 30 60 90).
+
+Usage: python simulate.py [--duration SECONDS] [--realtime | --warp [--warp-frame SECONDS]] [--seed N] [--set KEY=VALUE] [--sweep KEY VALUE...]
+
+"""
+
+import os, sys, time, random, argparse, json, subprocess
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+HEADLESS = os.path.join(SRC, 'headless')
+
+def install(overrides={}):
+    # Make the headless stand-ins shadow the Vizard modules. Must happen before common/experiment are imported.
+    if HEADLESS not in sys.path:
+        sys.path.insert(0, HEADLESS)
+    import viz
+    viz.setOption('viz.publish.path', SRC)
+    viz.setOption('dreamcafe.wallclock', 0) # The rt clock follows simulated time, so seeded runs repeat
+
+    if overrides:
+        from ruviz import utils
+        utils.Config.overrides = overrides
+
+    from headless import engine
+    return engine
+
+
+"""
+Participant
+"""
+
+class Participant():
+    # Scripted participant: looks around the cafe so view-dependent logic (inView) keeps progressing,
+    # and carries each order to its table after a while by moving its loose items into the table sensor.
+    def __init__(self, engine, view, period=20.0, delivery=[5,20], skip=0.1):
+        import viz, common
+        self.engine = engine
+        self.view = view
+        self.period = period
+        self.delivery = delivery
+        self.skip = skip # Chance an order is never delivered (expires)
+        self.t = 0.0
+        engine.updaters.append(self.update)
+        self.events = viz.EventClass() # Not viz.callback: that keeps one handler per event and would replace the app's
+        self.events.callback(common.ORDER_EVENT, self.onOrder)
+
+    def update(self, dt):
+        self.t += dt
+        yaw = (self.t / self.period * 360.0) % 360.0 - 180.0
+        self.view.setEuler([yaw,0,0])
+
+    def onOrder(self, order, *args, **kwargs):
+        if random.random() >= self.skip:
+            self.engine.addTimer(random.uniform(*self.delivery), 0, self.deliver, order)
+
+    def deliver(self, order):
+        import viz, common
+        for table in common.tables:
+            if table.id == order.table_id:
+                x,y,z = table.deliverPoints[order.seat-1]
+                for obj in order.items:
+                    dyno = common.itemRegistry.get(obj)
+                    if dyno and not dyno.link and not obj.removed and dyno.generation == order.generations.get(obj):
+                        obj.setPosition([x,y+0.1,z],mode=viz.ABS_GLOBAL)
+
+
+"""
+Stats
+"""
+
+class Stats():
+    def __init__(self, engine):
+        import viz, common, experiment
+        self.engine = engine
+        self.experiment = experiment
+        self.numSeats = sum([len(t.seats) for t in common.tables])
+        self.seatTime = 0.0
+        self.counts = dict.fromkeys(['customers_created','customers_served','customers_left','orders_created',
+            'orders_delivered','orders_partial','orders_expired','zero_gravity','waste_spawned'], 0)
+        self.served = set()
+        self.left = set()
+
+        engine.updaters.append(self.update)
+        self.events = viz.EventClass()
+        self.events.callback(common.CUSTOMER_ENTER_EVENT, lambda c,*a,**k: self._count('customers_created'))
+        self.events.callback(common.CUSTOMER_LEAVE_EVENT, self.onCustomerLeave)
+        self.events.callback(common.ORDER_EVENT, lambda o,*a,**k: self._count('orders_created'))
+        self.events.callback(common.DELIVER_EVENT, self.onDeliver)
+        self.events.callback(common.EXPIRE_EVENT, lambda o,*a,**k: self._count('orders_expired'))
+        self.events.callback(common.GRAVITY_EVENT, self.onGravity)
+        self.events.callback(common.WASTE_EVENT, lambda p,*a,**k: self._count('waste_spawned'))
+
+    def _count(self, key):
+        self.counts[key] += 1
+
+    def update(self, dt):
+        occupied = self.numSeats - len(self.experiment.available_seats)
+        self.seatTime += occupied * dt
+
+    def onDeliver(self, order, complete, *args, **kwargs):
+        self._count('orders_delivered' if complete else 'orders_partial')
+        if complete:
+            self.served.add(order.customer)
+
+    def onCustomerLeave(self, customer, *args, **kwargs):
+        if customer in self.left:
+            return # Leave is sent again when a scared customer had already left
+        self.left.add(customer)
+        self._count('customers_left')
+        if customer in self.served:
+            self._count('customers_served')
+
+    def onGravity(self, force, *args, **kwargs):
+        import common
+        if force == common.ZEROG:
+            self._count('zero_gravity')
+
+    def summary(self):
+        result = dict(self.counts)
+        t = self.engine.time
+        result['seat_utilisation'] = round(self.seatTime / (t * self.numSeats), 3) if t else 0.0
+        return result
+
+
+"""
+Session
+"""
+
+def run(duration, realtime=False, warp=False, warpFrame=None, seed=None, overrides={}):
+    engine = install(overrides)
+    random.seed(seed)
+    engine.realtime = realtime
+    engine.warp = warp
+    if warpFrame:
+        engine.warpFrameTime = warpFrame
+
+    import viz, common, experiment
+    view = experiment.vive.hmd.getSensor() if common.VIVE else viz.MainView
+    Participant(engine, view)
+    stats = Stats(engine)
+
+    experiment.onKeydown(common.KEY_START)
+    t0 = time.time()
+    frames = engine.run(duration=duration)
+    wall = time.time() - t0
+    engine.exit()
+
+    result = stats.summary()
+    result.update({
+        'frames' : frames,
+        'sim_time' : round(engine.time, 3),
+        'wall_time' : round(wall, 3),
+        'fps' : round(frames / wall, 1) if wall else 0.0,
+        'errors' : engine.errors,
+        })
+    return result
+
+def sweep(key, values, argv):
+    # Every run needs a fresh interpreter, since common and experiment set up their state at import
+    results = []
+    for value in values:
+        cmd = [sys.executable, os.path.abspath(__file__), '--json', '--set', '{}={}'.format(key, value)] + argv
+        out = subprocess.check_output(cmd)
+        results.append((value, json.loads(out.decode('utf-8').strip().splitlines()[-1])))
+    return results
+
+def _parseSet(items):
+    overrides = {}
+    for item in items:
+        k, _, v = item.partition('=')
+        overrides[k] = v
+    return overrides
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the Dream Cafe experiment headless.')
+    parser.add_argument('--duration', type=float, default=60.0, help='simulated session length in seconds')
+    parser.add_argument('--realtime', action='store_true', help='pace frames to the nominal frame rate')
+    parser.add_argument('--warp', action='store_true', help='jump the clock to the next scheduled wakeup')
+    parser.add_argument('--warp-frame', type=float, default=None, help='longest frame in time-warp mode (default 0.1)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for a reproducible session')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='override a config value')
+    parser.add_argument('--sweep', nargs='+', metavar='KEY VALUE', help='run once per value of a config key')
+    parser.add_argument('--json', action='store_true', help='print the summary as a single json line')
+    args = parser.parse_args()
+
+    if args.sweep:
+        argv = [a for a in sys.argv[1:]]
+        i = argv.index('--sweep')
+        argv = argv[:i] + argv[i+1+len(args.sweep):]
+        key = args.sweep[0]
+        results = sweep(key, args.sweep[1:], argv)
+        cols = sorted(results[0][1]) if results else []
+        print('\t'.join([key] + cols))
+        for value, stats in results:
+            print('\t'.join([value] + [str(stats[c]) for c in cols]))
+    else:
+        stats = run(args.duration, realtime=args.realtime, warp=args.warp, warpFrame=args.warp_frame, seed=args.seed, overrides=_parseSet(args.set))
+        if args.json:
+            print(json.dumps(stats, sort_keys=True))
+        else:
+            for key in sorted(stats):
+                print('{:<20}{}'.format(key, stats[key]))
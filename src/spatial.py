@@ -0,0 +1,141 @@
+"""
+Dream Cafe - Spatial module
+Version: 0.1.3
+
+The spatial module keeps a uniform grid of dynamic items, so grabbers only have to test the items near the hand
+instead of all the clutter in the cafe. Items are bucketed by the center of their bounding box; a query is
+widened by the largest item radius, so items that stick out of their cell are still found.
+
+Resting items stay where they are, so only moving items are re-bucketed, once per frame; the grid's timer only runs
+while there are any. An item counts as moving from when it is added or woken until it has been slower than
+SETTLE_SPEED and stayed within SETTLE_DISTANCE for SETTLE_FRAMES frames, so bodies drifting in zero gravity keep
+being followed however slowly they go. Whatever moves items wakes them: grabbers while holding, collisions and
+scripted moves; items linked to a parent with attach() are woken with it.
+
+"""
+
+import math
+import viz
+from bounds import bounds
+
+CELL_SIZE = 0.5 #m
+SETTLE_FRAMES = 10
+SETTLE_DISTANCE = 0.005 #m
+SETTLE_SPEED = 0.0001 #m/s
+
+class SpatialGrid(viz.EventClass):
+    def __init__(self, size=CELL_SIZE):
+        viz.EventClass.__init__(self)
+        self.size = float(size)
+        self.cells = {}     # cell: set of nodes
+        self.where = {}     # node: cell
+        self.moving = {}    # node: [center it last moved from, frames since]
+        self.children = {}  # parent: set of attached nodes
+        self.parents = {}   # node: parent
+        self.maxRadius = 0.0
+        self.running = False
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.COLLIDE_BEGIN_EVENT, self._onCollide)
+
+    def _cell(self, pos):
+        return tuple([int(math.floor(p / self.size)) for p in pos])
+
+    def _center(self, node):
+        return bounds.getBoundingBox(node).center
+
+    def _move(self, node, cell):
+        old = self.where.get(node)
+        if old == cell:
+            return
+        if old is not None:
+            self.cells[old].discard(node)
+            if not self.cells[old]:
+                del self.cells[old]
+        self.where[node] = cell
+        self.cells.setdefault(cell, set()).add(node)
+
+    def add(self, node):
+        if node not in self.where:
+            self.maxRadius = max(self.maxRadius, bounds.getRadius(node))
+            self.where[node] = None # Bucketed by wake()
+            self.wake(node)
+
+    def remove(self, node):
+        self.detach(node)
+        for child in self.children.pop(node, ()):
+            self.parents.pop(child, None)
+        self.moving.pop(node, None)
+        if self.running and not self.moving:
+            self.killtimer(0)
+            self.running = False
+        cell = self.where.pop(node, None)
+        if cell is not None:
+            self.cells[cell].discard(node)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def wake(self, node):
+        # Re-bucket node (and the nodes attached to it) every frame until it settles
+        if node in self.where:
+            bounds.invalidate(node) # Moved since it was last looked up, maybe in this frame
+            pos = self._center(node)
+            self._move(node, self._cell(pos))
+            self.moving[node] = [pos, 0]
+            if not self.running:
+                self.running = True
+                self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+        for child in self.children.get(node, ()):
+            self.wake(child)
+
+    def attach(self, node, parent):
+        # node follows parent through a link, so it moves whenever parent does
+        self.detach(node)
+        self.parents[node] = parent
+        self.children.setdefault(parent, set()).add(node)
+
+    def detach(self, node):
+        parent = self.parents.pop(node, None)
+        if parent is not None:
+            self.children[parent].discard(node)
+            if not self.children[parent]:
+                del self.children[parent]
+
+    def _onCollide(self, e):
+        self.wake(e.obj1)
+        self.wake(e.obj2)
+
+    def _onTimer(self, id):
+        for node, state in list(self.moving.items()):
+            pos = self._center(node)
+            self._move(node, self._cell(pos))
+            anchor = state[0]
+            v = node.getVelocity()
+            if (pos[0]-anchor[0])**2 + (pos[1]-anchor[1])**2 + (pos[2]-anchor[2])**2 > SETTLE_DISTANCE**2:
+                state[0] = pos
+                state[1] = 0
+            elif v[0]*v[0] + v[1]*v[1] + v[2]*v[2] > SETTLE_SPEED**2:
+                state[1] = 0 # Slow drift, keep following it
+            else:
+                state[1] += 1
+                if state[1] >= SETTLE_FRAMES:
+                    del self.moving[node]
+        if not self.moving:
+            self.killtimer(0)
+            self.running = False
+
+    def query(self, pos, radius):
+        # All items in cells overlapping the sphere, widened by the largest item radius
+        r = radius + self.maxRadius
+        lo = self._cell([p - r for p in pos])
+        hi = self._cell([p + r for p in pos])
+        found = []
+        for i in range(lo[0], hi[0] + 1):
+            for j in range(lo[1], hi[1] + 1):
+                for k in range(lo[2], hi[2] + 1):
+                    found.extend(self.cells.get((i,j,k), ()))
+        return found
+
+    def __len__(self):
+        return len(self.where)
+
+grid = SpatialGrid()
@@ -0,0 +1,86 @@
+"""
+Dream Cafe - Startup module
+Version: 0.1.3
+
+The startup module times what common does at import: init and config phases, and every resource load. While
+running it wraps viz.add, viz.addChild, viz.addTexture and viz.addAvatar, so each load shows up with its file name;
+phases (Config(), setRes, Avatar construction, ...) are marked with 'with startup.phase(name):'.
+
+Timing is cheap, so it always runs; common decides after reading the config whether finish() prints the report and
+writes it to data/startup_<timestamp>.json ('seta d_startup "1"'). finish() puts the viz functions back.
+
+"""
+
+import os, time, json
+import viz
+from contextlib import contextmanager
+from timeit import default_timer as clock
+from ruviz import utils
+
+LOADERS = ['add', 'addChild', 'addTexture', 'addAvatar']
+
+class StartupProfiler():
+    def __init__(self):
+        self.spans = []     # [name, start, duration, depth]
+        self.depth = 0
+        self.originals = {}
+        self.t0 = None
+
+    def start(self):
+        self.t0 = clock()
+        for name in LOADERS:
+            if hasattr(viz, name):
+                self.originals[name] = getattr(viz, name)
+                setattr(viz, name, self._wrap(name, self.originals[name]))
+
+    def _wrap(self, name, func):
+        def _load(resource=None, *args, **kwargs):
+            label = '{} {}'.format(name, resource) if isinstance(resource, basestring) else name
+            with self.phase(label):
+                if resource is None:
+                    return func(*args, **kwargs)
+                return func(resource, *args, **kwargs)
+        return _load
+
+    @contextmanager
+    def phase(self, name):
+        span = [name, clock() - self.t0 if self.t0 is not None else 0.0, 0.0, self.depth]
+        self.spans.append(span)
+        self.depth += 1
+        t = clock()
+        try:
+            yield
+        finally:
+            span[2] = clock() - t
+            self.depth -= 1
+
+    def finish(self, report=False):
+        for name, func in self.originals.items():
+            setattr(viz, name, func)
+        self.originals = {}
+        if not report:
+            return
+        total = clock() - self.t0
+        for line in self.report(total):
+            viz.logNotice(line)
+        self.write(total)
+
+    def report(self, total):
+        lines = ['Startup: {:.3f} s until common was loaded'.format(total)]
+        for name, start, duration, depth in sorted(self.spans, key=lambda s: -s[2]):
+            lines.append('{:>9.1f} ms {:>5.1f}%  {}{}'.format(duration * 1000, 100.0 * duration / total if total else 0, '  ' * depth, name))
+        return lines
+
+    def write(self, total):
+        folder = utils.getPath('data')
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        path = os.path.join(folder, 'startup_{}.json'.format(time.strftime('%Y%m%d%H%M%S', time.localtime())))
+        with open(path, 'w') as f:
+            json.dump({
+                'total' : total,
+                'spans' : [{'name':n, 'start':s, 'duration':d, 'depth':k} for n,s,d,k in self.spans],
+                }, f, indent=1)
+        return path
+
+startup = StartupProfiler()
@@ -0,0 +1,15 @@
+"""
+Dream Cafe - Test support
+
+Puts src/ on the path and installs the headless backend, which has to happen before viz, common or experiment are
+imported. Every test module imports it first:
+
+    from support import engine
+    import viz, common
+
+"""
+
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import simulate
+engine = simulate.install()
@@ -0,0 +1,52 @@
+"""
+Dream Cafe - Avatar level of detail tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import viz, common, experiment
+
+class AvatarLODTest(unittest.TestCase):
+    def setUp(self):
+        self.avatar = common.avatars[0]
+        table = common.tables[0]
+        self.avatar.sit(table.id, 1)
+        self.seat = table.seats[0]
+        # Turn the view the way the participant would, through the headset when the rig drives MainView
+        self.view = experiment.vive.hmd.getSensor() if common.VIVE else viz.MainView
+        offset = experiment.transporter.getPosition(viz.ABS_GLOBAL) if common.VIVE else [0, 0, 0]
+        self.view.setPosition([self.seat[0] - offset[0], 1.7 - offset[1], self.seat[2] - 2.0 - offset[2]])
+        self.view.setEuler([0, 0, 0]) # Facing the avatar
+        engine.step()
+
+    def tearDown(self):
+        self.avatar.leave()
+        engine.step()
+
+    def test_sit_moves_avatar_with_transport(self):
+        pos = self.avatar.avatar.getPosition(viz.ABS_GLOBAL)
+        self.assertEqual([round(p, 6) for p in pos], [round(p, 6) for p in self.seat])
+
+    def test_turning_away_freezes_at_once(self):
+        self.assertEqual(self.avatar.lod, common.LOD_FULL)
+        self.view.setEuler([180, 0, 0])
+        engine.step() # Well before the next LOD_TIME tick
+        self.assertEqual(self.avatar.lod, common.LOD_FROZEN)
+        self.view.setEuler([0, 0, 0])
+        engine.step()
+        self.assertEqual(self.avatar.lod, common.LOD_FULL)
+
+    def test_leave_turns_off(self):
+        self.avatar.leave()
+        self.assertEqual(self.avatar.lod, common.LOD_OFF)
+
+    def test_timers_only_run_while_seated(self):
+        self.assertTrue(common.avatarLOD.running)
+        self.avatar.leave()
+        self.assertFalse(common.avatarLOD.running) # Nobody else is seated
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Dream Cafe - Clock tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import viz, common, experiment
+
+class ClockTest(unittest.TestCase):
+    def setUp(self):
+        experiment.mainClock.setMode(None) # Keep its events out of the way
+        self.clock = experiment.Clock()
+        self.events = []
+        self.listener = viz.EventClass()
+        self.listener.callback(common.CLOCK_EVENT, self._onClock)
+
+    def tearDown(self):
+        self.listener.unregister()
+        self.clock.unregister()
+        experiment.mainClock.setMode('rt')
+
+    def _onClock(self, t):
+        self.events.append(list(t))
+
+    def _run(self, seconds, frame=0.1):
+        for i in range(int(round(seconds / frame))):
+            engine.step(frame)
+
+    def _seconds(self, t):
+        return t[0] * 3600 + t[1] * 60 + t[2]
+
+    def test_rt_runs_at_one_second_per_second(self):
+        base = self.clock.getTime()
+        self.assertEqual(base, int(base)) # Starts on a whole second
+        self._run(10)
+        self.assertAlmostEqual(self.clock.getTime(), base + 10, places=6)
+        self.assertEqual(self._seconds(self.clock.t), (base + 10) % experiment.DAY)
+
+    def test_rt_sends_one_event_per_second(self):
+        del self.events[:]
+        self._run(5)
+        self.assertEqual(len(self.events), 5)
+        seconds = [self._seconds(t) for t in self.events]
+        self.assertEqual(seconds, list(range(seconds[0], seconds[0] + 5)))
+
+    def test_ff_runs_2700_seconds_in_10(self):
+        base = self.clock.getTime()
+        self.clock.setMode('ff')
+        self._run(10)
+        self.assertAlmostEqual(self.clock.getTime(), base + 2700, places=6)
+        self.assertEqual(self._seconds(self.clock.t), int(base + 2700) % experiment.DAY)
+
+    def test_rw_runs_backwards(self):
+        self.clock.setMode('rw')
+        base = self.clock.getTime()
+        self.assertEqual(base, int(base))
+        self.assertEqual(self._seconds(self.clock.t), base % experiment.DAY) # Switching shows the current second
+        self._run(0.5)
+        self.assertEqual(self._seconds(self.clock.t), (base - 1) % experiment.DAY)
+        self._run(2.0)
+        self.assertAlmostEqual(self.clock.getTime(), base - 2.5, places=6)
+        self.assertEqual(self._seconds(self.clock.t), int(base - 3) % experiment.DAY) # floor(base - 2.5)
+
+    def test_rw_sends_one_event_per_second(self):
+        self.clock.setMode('rw')
+        base = int(self.clock.getTime())
+        del self.events[:]
+        self._run(3.5)
+        self.assertEqual([self._seconds(t) for t in self.events], [(base - i) % experiment.DAY for i in [1, 2, 3, 4]])
+
+    def test_stopped_clock_keeps_time(self):
+        self.clock.setMode(None)
+        base = self.clock.getTime()
+        del self.events[:]
+        self._run(3)
+        self.assertEqual(self.clock.getTime(), base)
+        self.assertEqual(self.events, [])
+
+    def test_mode_change_continues_from_current_time(self):
+        self.clock.setMode('ff')
+        self._run(1)
+        self.clock.setMode('rw', rate=-2.0)
+        base = self.clock.getTime()
+        self._run(2)
+        self.assertAlmostEqual(self.clock.getTime(), base - 4, places=6)
+
+    def test_wraps_at_midnight(self):
+        self.clock.setMode(None)
+        self.clock.base = experiment.DAY - 0.5
+        self.clock.setMode('ff', rate=1.0)
+        self._run(1)
+        self.assertEqual(self.clock.t, [0, 0, 0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Dream Cafe - Config tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest, os, shutil, tempfile
+from support import engine
+from ruviz import utils
+
+SCHEMA = {
+    'd_rate' : 'float',
+    'd_count' : 'int',
+    'd_on' : 'bool',
+    'd_names' : 'list',
+    'd_sizes' : ('list','int'),
+}
+
+DEFAULT = '''// Defaults
+seta d_rate "0.5"
+seta d_count "3"
+seta d_on "yes"
+seta d_names "a; b, c"
+seta d_sizes "1;2;3"
+'''
+
+class ConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.dir = os.path.join(self.root, 'cfg')
+        os.mkdir(self.dir)
+        self._write('default', DEFAULT)
+        self._write('user', 'seta d_count "4"\n')
+        self.errors = []
+        self.logError = utils.viz.logError
+        utils.viz.logError = self.errors.append
+        self.parsed = []
+        self.loadConfig = utils.Config._loadConfig
+        def loadConfig(config, path, known=None):
+            self.parsed.append(os.path.basename(path))
+            return self.loadConfig(config, path, known)
+        utils.Config._loadConfig = loadConfig
+
+    def tearDown(self):
+        utils.viz.logError = self.logError
+        utils.Config._loadConfig = self.loadConfig
+        shutil.rmtree(self.root)
+
+    def _write(self, profile, text, mtime=None):
+        path = os.path.join(self.dir, profile + '.cfg')
+        with open(path, 'wb') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def _config(self, schema=SCHEMA):
+        return utils.Config(dir=self.dir, schema=schema)
+
+    def test_values_are_converted(self):
+        config = self._config()
+        self.assertEqual(config.get('d_rate'), 0.5)
+        self.assertEqual(config.get('d_count'), 4) # user.cfg overrides default.cfg
+        self.assertIs(config.get('d_on'), True)
+        self.assertEqual(config.get('d_names'), ['a','b','c'])
+        self.assertEqual(config.get('d_sizes'), [1,2,3])
+        self.assertEqual(self.errors, [])
+
+    def test_lists_are_copies(self):
+        config = self._config()
+        config.get('d_sizes').append(4)
+        self.assertEqual(config.get('d_sizes'), [1,2,3])
+
+    def test_missing_key(self):
+        schema = dict(SCHEMA, d_extra='int')
+        with self.assertRaises(utils.ConfigError):
+            self._config(schema)
+
+    def test_bad_value(self):
+        self._write('user', 'seta d_count "four"\n')
+        with self.assertRaises(utils.ConfigError):
+            self._config()
+
+    def test_unknown_key_is_reported(self):
+        self._write('user', 'seta d_count "4"\nseta d_typo "1"\n')
+        config = self._config()
+        self.assertEqual(len(self.errors), 1)
+        self.assertIn('d_typo', self.errors[0])
+        self.assertIn('user.cfg line 2', self.errors[0])
+        with self.assertRaises(utils.ConfigError):
+            config.get('d_typo')
+
+    def test_cache_is_reused(self):
+        config = self._config()
+        self.assertTrue(os.path.exists(config.cachePath))
+        self.assertEqual(sorted(self.parsed), ['default.cfg','user.cfg'])
+        del self.parsed[:]
+        self.assertEqual(self._config().values, config.values)
+        self.assertEqual(self.parsed, [])
+
+    def test_changed_file_is_parsed_again(self):
+        self._config()
+        del self.parsed[:]
+        self._write('user', 'seta d_count "5"\n', mtime=1e9)
+        self.assertEqual(self._config().get('d_count'), 5)
+        self.assertEqual(self.parsed, ['user.cfg'])
+
+    def test_changed_schema_ignores_cache(self):
+        self._config()
+        del self.parsed[:]
+        config = self._config(dict(SCHEMA, d_count='float'))
+        self.assertEqual(config.get('d_count'), 4.0)
+        self.assertIsInstance(config.get('d_count'), float)
+        self.assertEqual(sorted(self.parsed), ['default.cfg','user.cfg'])
+
+    def test_reload_returns_changes(self):
+        config = self._config()
+        self.assertEqual(config.reload(), {})
+        self._write('user', 'seta d_count "4"\nseta d_rate "0.25"\n', mtime=1e9)
+        self.assertEqual(config.reload(), {'d_rate' : (0.5, 0.25)})
+        self.assertEqual(config.get('d_rate'), 0.25)
+
+    def test_invalid_reload_keeps_values(self):
+        config = self._config()
+        self._write('user', 'seta d_count "four"\n', mtime=1e9)
+        with self.assertRaises(utils.ConfigError):
+            config.reload()
+        self.assertEqual(config.get('d_count'), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Dream Cafe - Headless backend tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import viz
+
+class CallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.event = viz.getEventID('TEST_CALLBACK_EVENT')
+        self.calls = []
+
+    def tearDown(self):
+        viz.callback(self.event, None)
+
+    def test_global_callback_replaces(self):
+        viz.callback(self.event, lambda: self.calls.append('first'))
+        viz.callback(self.event, lambda: self.calls.append('second'))
+        viz.sendEvent(self.event)
+        self.assertEqual(self.calls, ['second'])
+        viz.callback(self.event, None)
+        viz.sendEvent(self.event)
+        self.assertEqual(self.calls, ['second'])
+
+    def test_class_callbacks_add_up(self):
+        a, b = viz.EventClass(), viz.EventClass()
+        a.callback(self.event, lambda: self.calls.append('a'))
+        b.callback(self.event, lambda: self.calls.append('b'))
+        viz.callback(self.event, lambda: self.calls.append('global'))
+        viz.sendEvent(self.event)
+        a.unregister()
+        b.unregister()
+        self.assertEqual(sorted(self.calls), ['a', 'b', 'global'])
+
+class WarpTest(unittest.TestCase):
+    def test_idle_experiment_jumps_to_wakeups(self):
+        import experiment # Not started: no customers, only the clock and other idle timers
+        warp = engine.warp
+        engine.warp = True
+        try:
+            duration = 600.0
+            frames = engine.run(duration=duration)
+        finally:
+            engine.warp = warp
+        self.assertFalse(engine.frameBound())
+        self.assertLess(frames, duration / engine.warpFrameTime / 5) # Per-frame work would take 10 frames a second
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Dream Cafe - LCD atlas tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest, shutil, tempfile
+from support import engine
+import viz, common, lcdatlas
+
+VALUES = range(lcdatlas.COLUMNS * lcdatlas.ROWS)
+
+class CellTest(unittest.TestCase):
+    def test_cells_tile_the_texture(self):
+        seen = set()
+        for v in VALUES:
+            (u,t),(su,st) = lcdatlas.getCell(v)
+            self.assertAlmostEqual(su, 1.0 / lcdatlas.COLUMNS)
+            self.assertAlmostEqual(st, 1.0 / lcdatlas.ROWS)
+            self.assertTrue(0 <= u and u + su <= 1 + 1e-9, v)
+            self.assertTrue(0 <= t and t + st <= 1 + 1e-9, v)
+            seen.add((round(u,6),round(t,6)))
+        self.assertEqual(len(seen), len(VALUES))
+
+    def test_cells_follow_the_layout(self):
+        # Column v % 10, row v // 10 from the top, texture coordinates from the bottom
+        for v in VALUES:
+            (u,t),_ = lcdatlas.getCell(v)
+            self.assertAlmostEqual(u, (v % 10) / 10.0)
+            self.assertAlmostEqual(t, (lcdatlas.ROWS - 1 - v // 10) / float(lcdatlas.ROWS))
+
+class DigitalClockTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = common.DigitalClock(viz.addGroup(), 0, atlas='lcd.png')
+        self.texmats = {}
+        for lcd in [self.clock.h, self.clock.m, self.clock.s]:
+            lcd.texmat = lambda m, lcd=lcd: self.texmats.__setitem__(lcd, m)
+
+    def tearDown(self):
+        common.clocks.remove(self.clock)
+
+    def test_quad_maps_onto_each_cell(self):
+        for v in VALUES:
+            offset,size = lcdatlas.getCell(v)
+            m = self.clock.cells[v]
+            for a,b in zip(m.preMultVec([0,0,0]), offset + [0]):
+                self.assertAlmostEqual(a, b)
+            for a,b in zip(m.preMultVec([1,1,0]), [offset[0] + size[0], offset[1] + size[1], 0]):
+                self.assertAlmostEqual(a, b)
+
+    def test_set_time_shows_the_cells(self):
+        self.clock.setTime([12,34,56])
+        self.assertIs(self.texmats[self.clock.h], self.clock.cells[12])
+        self.assertIs(self.texmats[self.clock.m], self.clock.cells[34])
+        self.assertIs(self.texmats[self.clock.s], self.clock.cells[56])
+
+    def test_set_time_skips_unchanged_fields(self):
+        self.clock.setTime([12,34,56])
+        self.texmats.clear()
+        self.clock.setTime([12,34,57])
+        self.assertEqual(list(self.texmats), [self.clock.s])
+
+@unittest.skipIf(lcdatlas.Image is None, 'PIL is not available')
+class AtlasTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache)
+
+    def test_cells_hold_their_glyphs(self):
+        from PIL import Image, ImageDraw, ImageFont
+        atlas = Image.open(lcdatlas.getAtlas(cache=self.cache))
+        W,H = atlas.size
+        face = ImageFont.truetype(lcdatlas.FONT, lcdatlas.FONT_SIZE)
+        for v in VALUES:
+            (u,t),(su,st) = lcdatlas.getCell(v)
+            x,y = int(round(u * W)), int(round((1 - t - st) * H)) # Image rows run from the top
+            cell = atlas.crop((x, y, x + lcdatlas.CELL[0], y + lcdatlas.CELL[1]))
+            glyph = Image.new('RGBA', lcdatlas.CELL, (255, 255, 255, 0))
+            lcdatlas.drawCell(ImageDraw.Draw(glyph), face, v, 0, 0)
+            self.assertIsNotNone(glyph.getbbox(), v)
+            self.assertEqual(cell.tobytes(), glyph.tobytes(), v)
+
+    def test_cache_is_reused(self):
+        path = lcdatlas.getAtlas(cache=self.cache)
+        self.assertEqual(lcdatlas.getAtlas(cache=self.cache), path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Dream Cafe - Throw velocity tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import experiment
+
+class MotionBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.motion = experiment.MotionBuffer(size=6)
+
+    def assertVector(self, a, b):
+        self.assertEqual(len(a), len(b))
+        for x,y in zip(a,b):
+            self.assertAlmostEqual(x, y)
+
+    def _fill(self, times, velocity, start=[1,2,3]):
+        for t in times:
+            self.motion.add(t, [p + v*t for p,v in zip(start,velocity)])
+
+    def test_constant_velocity(self):
+        self._fill([0.01 * i for i in range(6)], [1,-2,0.5])
+        self.assertVector(self.motion.velocity(window=1), [1,-2,0.5])
+
+    def test_too_few_samples(self):
+        self.assertVector(self.motion.velocity(), [0,0,0])
+        self.motion.add(0, [1,2,3])
+        self.assertVector(self.motion.velocity(), [0,0,0])
+
+    def test_zero_time_span(self):
+        for i in range(3):
+            self.motion.add(0.5, [i,0,0])
+        self.assertVector(self.motion.velocity(), [0,0,0])
+
+    def test_window_keeps_recent_samples(self):
+        # The hand stopped a while ago and then moved off; only the recent motion counts
+        self._fill([0,0.1,0.2], [0,0,0])
+        for t in [1.0,1.01,1.02]:
+            self.motion.add(t, [1 + 3*(t - 1),2,3])
+        self.assertVector(self.motion.velocity(window=0.05), [3,0,0])
+
+    def test_window_falls_back_to_last_two(self):
+        self._fill([0,1,2], [2,0,0])
+        self.assertVector(self.motion.velocity(window=0.1), [2,0,0])
+
+    def test_ring_wraps(self):
+        # Old samples are overwritten: only the last six are fitted
+        self._fill([0.01 * i for i in range(4)], [-5,0,0])
+        self._fill([1 + 0.01 * i for i in range(6)], [0,4,0])
+        self.assertVector(self.motion.velocity(window=1), [0,4,0])
+
+    def test_clear(self):
+        self._fill([0,0.01,0.02], [1,0,0])
+        self.motion.clear()
+        self.assertVector(self.motion.velocity(), [0,0,0])
+
+if __name__ == '__main__':
+    unittest.main()
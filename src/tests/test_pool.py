@@ -0,0 +1,130 @@
+"""
+Dream Cafe - ItemPool tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import viz, common
+
+class ItemPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = common.ItemPool(common.obj_cup, 1)
+
+    def test_acquire_hands_out_parked_item(self):
+        item = self.pool.free[0]
+        self.assertTrue(item.pooled)
+        self.assertIs(self.pool.acquire(), item)
+        self.assertFalse(item.pooled)
+        self.assertIn(item.obj, common.dynamicItems)
+        self.assertEqual(self.pool.free, [])
+
+    def test_acquire_creates_when_empty(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertIs(second.pool, self.pool)
+
+    def test_acquire_bumps_generation(self):
+        item = self.pool.acquire()
+        generation = item.generation
+        self.pool.release(item)
+        self.assertIs(self.pool.acquire(), item)
+        self.assertEqual(item.generation, generation + 1)
+
+    def test_release_parks_and_resets(self):
+        item = self.pool.acquire()
+        item.disposable = True
+        item.showPart('coffee', 0)
+        self.pool.release(item)
+        self.assertTrue(item.pooled)
+        self.assertFalse(item.disposable)
+        self.assertEqual(item.obj.getPosition(), common.POOL_PARK)
+        self.assertEqual(self.pool.free, [item])
+        self.pool.release(item) # Twice is harmless
+        self.assertEqual(self.pool.free, [item])
+
+    def test_stale_release_is_ignored(self):
+        item = self.pool.acquire()
+        old = item.generation
+        self.pool.release(item, old)
+        self.assertIs(self.pool.acquire(), item) # Recycled for a new owner
+        self.pool.release(item, old)
+        self.assertFalse(item.pooled)
+        self.pool.release(item, item.generation)
+        self.assertTrue(item.pooled)
+
+    def test_stale_discard_is_ignored(self):
+        item = self.pool.acquire()
+        old = item.generation
+        viz.sendEvent(common.DISCARD_EVENT, item.obj, old)
+        self.assertTrue(item.pooled)
+        self.pool.acquire()
+        viz.sendEvent(common.DISCARD_EVENT, item.obj, old) # e.g. a cleanup scheduled for the previous order
+        self.assertFalse(item.pooled)
+        self.assertIn(item.obj, common.dynamicItems)
+
+    def test_release_retires_item(self):
+        retired = []
+        listener = viz.EventClass()
+        listener.callback(common.RETIRE_EVENT, lambda obj, *args: retired.append(obj))
+        try:
+            item = self.pool.acquire()
+            self.pool.release(item)
+            self.pool.release(item)
+        finally:
+            listener.unregister()
+        self.assertEqual(retired, [item.obj]) # Once, parked items are not in play
+        self.assertNotIn(item.obj, common.dynamicItems)
+
+    def test_release_drops_grabbable(self):
+        item = self.pool.acquire()
+        common.grabbables.add([item.obj])
+        engine.step()
+        self.assertTrue(common.grabbables.isGrabbable(item.obj))
+        viz.sendEvent(common.DISCARD_EVENT, item.obj, item.generation) # Shared path of all discards
+        self.assertFalse(common.grabbables.isGrabbable(item.obj))
+        engine.step()
+        self.assertNotIn(item.obj, common.grabbables.items)
+
+class ExitProximityTest(unittest.TestCase):
+    class Order():
+        def __init__(self, item):
+            self.consumed = True
+            self.delivered = [item.obj]
+            self.cleaned = []
+            self.generations = {item.obj: item.generation}
+            self.table_id, self.seat = 1, 1
+
+    class Event():
+        def __init__(self, target):
+            self.target = target
+
+    def setUp(self):
+        import experiment
+        self.experiment = experiment
+        self.pool = common.ItemPool(common.obj_cup, 0)
+        self.item = self.pool.acquire()
+        self.order = self.Order(self.item)
+        experiment.delivered_orders.append(self.order)
+
+    def tearDown(self):
+        if self.order in self.experiment.delivered_orders:
+            self.experiment.delivered_orders.remove(self.order)
+
+    def test_exit_cleans_order(self):
+        self.experiment.onExitProximity(self.Event(self.item.obj))
+        self.assertEqual(self.order.cleaned, [self.item.obj])
+        self.assertNotIn(self.order, self.experiment.delivered_orders)
+
+    def test_exit_of_reused_item_is_ignored(self):
+        self.pool.release(self.item)
+        self.assertIs(self.pool.acquire(), self.item) # Now part of a newer order
+        self.experiment.onExitProximity(self.Event(self.item.obj))
+        self.assertEqual(self.order.cleaned, [])
+        self.assertIn(self.order, self.experiment.delivered_orders)
+
+if __name__ == '__main__':
+    unittest.main()
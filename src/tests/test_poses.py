@@ -0,0 +1,58 @@
+"""
+Dream Cafe - Pose stream tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import os, shutil, tempfile, unittest
+from support import engine
+import viz, poses, posestream
+
+SLOTS = 4
+
+class PoseRingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'poses.bin')
+        self.head = viz.addGroup()
+        self.stream = posestream.PoseStream()
+        self.stream.addSource('head', self.head)
+        self.stream.start(self.path, slots=SLOTS)
+        self.reader = poses.PoseReader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.stream.unregister()
+        self.stream._onExit()
+        shutil.rmtree(self.dir)
+
+    def _frames(self, count):
+        for i in range(count):
+            self.head.setPosition([self.stream.seq + 1, 0, 0]) # x is the record's sequence
+            engine.step()
+
+    def test_header(self):
+        self.assertEqual(self.reader.sources, ['head'])
+        self.assertEqual(self.reader.slots, SLOTS)
+        self.assertEqual(self.reader.poll(), [])
+
+    def test_poll_returns_new_records(self):
+        self._frames(3)
+        records = self.reader.poll()
+        self.assertEqual([r['seq'] for r in records], [1, 2, 3])
+        self.assertEqual([r['head'][0][0] for r in records], [1, 2, 3])
+        self._frames(2)
+        self.assertEqual([r['seq'] for r in self.reader.poll()], [4, 5])
+
+    def test_ring_wraps(self):
+        self._frames(SLOTS * 2 + 2)
+        self.assertIsNone(self.reader.read(1)) # Overwritten
+        records = self.reader.poll() # Fell behind, skips to the oldest record still in the ring
+        self.assertEqual([r['seq'] for r in records], [7, 8, 9, 10])
+        self.assertEqual([r['head'][0][0] for r in records], [7, 8, 9, 10])
+        self._frames(1)
+        self.assertEqual([r['seq'] for r in self.reader.poll()], [11])
+
+if __name__ == '__main__':
+    unittest.main()
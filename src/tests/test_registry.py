@@ -0,0 +1,111 @@
+"""
+Dream Cafe - Registry tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import registry
+
+class Item():
+    def __init__(self, obj):
+        self.obj = obj
+
+class ItemSetTest(unittest.TestCase):
+    def test_keeps_insertion_order(self):
+        items = registry.ItemSet([3,1,2])
+        items.add(0)
+        items.add(1) # Already in: keeps its place
+        self.assertEqual(list(items), [3,1,2,0])
+
+    def test_membership(self):
+        items = registry.ItemSet([1,2])
+        self.assertIn(1, items)
+        items.discard(1)
+        items.discard(1) # Not in: ignored
+        self.assertNotIn(1, items)
+        self.assertEqual(len(items), 1)
+        with self.assertRaises(KeyError):
+            items.remove(1)
+        items.clear()
+        self.assertEqual(len(items), 0)
+
+    def test_iterates_over_snapshot(self):
+        items = registry.ItemSet([1,2,3])
+        for item in items:
+            items.discard(item)
+            items.add(item + 10)
+        self.assertEqual(list(items), [11,12,13])
+
+class ItemRegistryTest(unittest.TestCase):
+    def test_maps_nodes_to_items(self):
+        items = registry.ItemRegistry()
+        a, b = Item('a'), Item('b')
+        items.register(a)
+        items.register(b)
+        self.assertIs(items['a'], a)
+        self.assertIs(items.get('b'), b)
+        self.assertIsNone(items.get('c'))
+        self.assertIn('a', items)
+        self.assertEqual(sorted(items), ['a','b'])
+
+    def test_unregister(self):
+        items = registry.ItemRegistry()
+        a = Item('a')
+        items.register(a)
+        self.assertIs(items.unregister('a'), a)
+        self.assertIsNone(items.unregister('a'))
+        self.assertNotIn('a', items)
+        self.assertEqual(len(items), 0)
+
+class GrabbableSetTest(unittest.TestCase):
+    def setUp(self):
+        self.grabbable = registry.GrabbableSet()
+        self.updates = []
+        self.grabbable.subscribe(lambda added, removed, version: self.updates.append((added, removed, version)))
+
+    def tearDown(self):
+        self.grabbable.unregister()
+
+    def test_changes_are_batched_per_frame(self):
+        self.grabbable.add(['a','b'])
+        self.grabbable.add(['c'])
+        self.assertEqual(len(self.grabbable), 0)
+        engine.step()
+        self.assertEqual(self.updates, [(['a','b','c'], [], 1)])
+        self.assertEqual(list(self.grabbable), ['a','b','c'])
+        engine.step()
+        self.assertEqual(len(self.updates), 1)
+        self.assertFalse(self.grabbable.running)
+
+    def test_latest_change_wins(self):
+        self.grabbable.add(['a','b'])
+        engine.step()
+        self.grabbable.remove(['a'])
+        self.grabbable.add(['a']) # Put back before the frame: nothing changes
+        self.grabbable.remove(['b'])
+        self.grabbable.add(['c'])
+        self.grabbable.remove(['c']) # Never added
+        engine.step()
+        self.assertEqual(self.updates[-1], ([], ['b'], 2))
+        self.assertEqual(list(self.grabbable), ['a'])
+
+    def test_no_update_without_changes(self):
+        self.grabbable.remove(['a'])
+        engine.step()
+        self.assertEqual(self.updates, [])
+        self.assertEqual(self.grabbable.version, 0)
+
+    def test_pending_removal_is_not_grabbable(self):
+        self.grabbable.add(['a'])
+        self.assertFalse(self.grabbable.isGrabbable('a')) # Not added until the frame
+        engine.step()
+        self.assertTrue(self.grabbable.isGrabbable('a'))
+        self.grabbable.remove(['a'])
+        self.assertFalse(self.grabbable.isGrabbable('a'))
+        self.assertIn('a', self.grabbable)
+
+if __name__ == '__main__':
+    unittest.main()
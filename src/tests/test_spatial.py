@@ -0,0 +1,157 @@
+"""
+Dream Cafe - SpatialGrid and HandGrabber tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import viz, common, spatial
+
+class SpatialGridTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = spatial.SpatialGrid()
+        self.pool = common.ItemPool(common.obj_cup, 0)
+        self.items = []
+
+    def tearDown(self):
+        self.grid.unregister()
+        for item in self.items:
+            self.pool.release(item)
+
+    def _item(self, pos):
+        item = self.pool.acquire()
+        item.obj.disable(viz.PHYSICS) # Stays where it is put
+        item.obj.setPosition(pos)
+        self.items.append(item)
+        return item.obj
+
+    def test_query_finds_near_items_only(self):
+        near = self._item([0.1, 1.0, 0.1])
+        far = self._item([3.0, 1.0, 3.0])
+        self.grid.add(near)
+        self.grid.add(far)
+        self.assertEqual(self.grid.query([0, 1.0, 0], 0.1), [near])
+        self.assertEqual(self.grid.query([3.1, 1.0, 2.9], 0.1), [far])
+        self.assertEqual(self.grid.query([10, 1.0, 10], 0.1), [])
+
+    def test_query_is_widened_by_item_radius(self):
+        obj = self._item([0.49, 1.0, 0.0]) # Center in the cell next to the query
+        self.grid.add(obj)
+        self.assertIn(obj, self.grid.query([0.5 + self.grid.maxRadius / 2, 1.0, 0.0], 0.0))
+
+    def test_removed_items_are_not_found(self):
+        obj = self._item([0, 1.0, 0])
+        self.grid.add(obj)
+        self.grid.remove(obj)
+        self.assertEqual(self.grid.query([0, 1.0, 0], 0.5), [])
+        self.assertEqual(len(self.grid), 0)
+        self.assertEqual(self.grid.cells, {})
+
+    def test_moving_item_is_rebucketed_then_settles(self):
+        obj = self._item([0, 1.0, 0])
+        self.grid.add(obj)
+        obj.setPosition([3.0, 1.0, 0])
+        engine.step()
+        self.assertEqual(self.grid.query([3.0, 1.0, 0], 0.1), [obj])
+        for i in range(spatial.SETTLE_FRAMES):
+            engine.step()
+        self.assertNotIn(obj, self.grid.moving)
+        obj.setPosition([0, 1.0, 0]) # Nobody woke it
+        engine.step()
+        self.assertEqual(self.grid.query([0, 1.0, 0], 0.1), [])
+        self.grid.wake(obj)
+        self.assertEqual(self.grid.query([0, 1.0, 0], 0.1), [obj])
+
+    def test_drifting_item_is_followed(self):
+        obj = self._item([0.4, 1.0, 0.1])
+        gravity = viz.phys.getGravity()
+        enabled = engine.physics.enabled
+        viz.phys.enable()
+        viz.phys.setGravity([0, 0, 0])
+        try:
+            obj.enable(viz.PHYSICS)
+            obj.setVelocity([0.03, 0, 0]) # A zero-G drift: well under SETTLE_DISTANCE per frame
+            self.grid.add(obj)
+            for i in range(900): # 10s at 90 Hz
+                engine.step()
+        finally:
+            viz.phys.setGravity(gravity)
+            engine.physics.enabled = enabled
+        pos = obj.getBoundingBox().center
+        self.assertGreater(pos[0], 0.6) # In the next cell, out of reach of a query of the old one
+        self.assertIn(obj, self.grid.query(pos, 0.1))
+        self.assertIn(obj, self.grid.moving)
+
+    def test_timer_only_runs_while_items_move(self):
+        obj = self._item([0, 1.0, 0])
+        self.grid.add(obj)
+        self.assertTrue(self.grid.running)
+        for i in range(spatial.SETTLE_FRAMES + 1):
+            engine.step()
+        self.assertFalse(self.grid.running)
+
+    def test_waking_parent_wakes_attached(self):
+        parent = self._item([0, 1.0, 0])
+        child = self._item([0, 1.1, 0])
+        self.grid.add(parent)
+        self.grid.add(child)
+        self.grid.attach(child, parent)
+        for i in range(spatial.SETTLE_FRAMES + 1):
+            engine.step()
+        child.setPosition([3.0, 1.1, 0])
+        self.grid.wake(parent)
+        self.assertEqual(self.grid.query([3.0, 1.1, 0], 0.1), [child])
+        self.grid.detach(child)
+        self.assertEqual(self.grid.children, {})
+
+class HandGrabberTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import experiment
+        cls.experiment = experiment
+        cls.hand = viz.addGroup()
+        cls.grabber = experiment.HandGrabber(cls.hand, None)
+
+    def setUp(self):
+        self.item = common.ItemPool(common.obj_cup, 0).acquire()
+        self.obj = self.item.obj
+        self.obj.disable(viz.PHYSICS)
+        self.obj.setPosition([5.0, 1.0, 5.0])
+        viz.sendEvent(common.ASSEMBLE_EVENT, [self.obj])
+        engine.step()
+
+    def tearDown(self):
+        self.grabber.release(momentum=False)
+        self.item.pool.release(self.item)
+        engine.step()
+
+    def _handAt(self, pos):
+        # The hand collider is carried by the transporter
+        offset = self.experiment.transporter.getPosition(viz.ABS_GLOBAL)
+        self.hand.setPosition([p - o for p, o in zip(pos, offset)])
+        engine.step()
+
+    def test_grab_picks_item_at_hand(self):
+        self._handAt(self.obj.getPosition(viz.ABS_GLOBAL))
+        self.assertIn(self.obj, self.grabber.tool.getItems())
+        self.grabber.grab()
+        self.assertIs(self.grabber.grabbed, self.obj)
+
+    def test_grab_ignores_items_out_of_reach(self):
+        self._handAt([-5.0, 1.0, -5.0])
+        self.assertNotIn(self.obj, self.grabber.tool.getItems())
+        self.grabber.grab()
+        self.assertIsNone(self.grabber.grabbed)
+
+    def test_released_item_is_no_candidate(self):
+        self._handAt(self.obj.getPosition(viz.ABS_GLOBAL))
+        viz.sendEvent(common.DISCARD_EVENT, self.obj, self.item.generation)
+        engine.step()
+        self.assertNotIn(self.obj, self.grabber.tool.getItems())
+        self.grabber.grab()
+        self.assertIsNone(self.grabber.grabbed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Dream Cafe - Visibility tests
+
+Run from src/ with: python -m unittest discover -s tests
+
+"""
+
+import unittest
+from support import engine
+import viz, viztask, visibility
+
+class VisibilityTest(unittest.TestCase):
+    def setUp(self):
+        self.view = viz.addGroup() # At the origin, looking along +z
+        self.service = visibility.VisibilityService(view=self.view, window=viz.VizWindow(self.view))
+        self.resumed = []
+        self.frames = 0
+
+    def tearDown(self):
+        self.service.unregister()
+
+    def _node(self, pos, size=0.2):
+        node = viz.VizNode('item', box=([0,0,0],[size]*3))
+        node.setPosition(pos)
+        return node
+
+    def _wait(self, *nodes):
+        yield self.service.waitOutOfView(*nodes)
+        self.resumed.append(self.frames)
+
+    def _run(self, frames):
+        for i in range(frames):
+            self.frames += 1
+            engine.step()
+
+    def test_in_view(self):
+        front = self._node([0,0,5])
+        side = self._node([3,0,5]) # 31 degrees off, inside the field of view
+        behind = self._node([0,0,-5])
+        right = self._node([5,0,0])
+        self.assertEqual(self.service.getInView([front, side, behind, right]), [True, True, False, False])
+        self.assertEqual(self.service.getInView([]), [])
+
+    def test_large_node_outside_fov_is_in_view(self):
+        # Its centre is beside the participant, but it still reaches into the view
+        self.assertTrue(self.service.inView(self._node([3,0,0], size=10)))
+
+    def test_view_turns(self):
+        node = self._node([5,0,0])
+        self.assertFalse(self.service.inView(node))
+        self.view.setEuler([90,0,0])
+        self._run(1) # Transforms are cached per frame
+        self.assertTrue(self.service.inView(node))
+
+    def test_waits_until_all_nodes_are_out_of_view(self):
+        a = self._node([0,0,5])
+        b = self._node([1,0,5])
+        viztask.schedule(self._wait(a, b))
+        self._run(1)
+        a.setPosition([0,0,-5])
+        self._run(visibility.STRIDE * 2)
+        self.assertEqual(self.resumed, [])
+        b.setPosition([0,0,-5])
+        moved = self.frames
+        self._run(visibility.STRIDE * 2)
+        self.assertEqual(len(self.resumed), 1)
+        self.assertLessEqual(self.resumed[0] - moved, visibility.STRIDE + 1)
+        self.assertFalse(self.service.running)
+
+    def test_tests_every_stride_frames(self):
+        node = self._node([0,0,-5])
+        tests = []
+        getInView = self.service.getInView
+        self.service.getInView = lambda nodes: tests.append(self.frames) or getInView(nodes)
+        viztask.schedule(self._wait(node))
+        viztask.schedule(self._wait(node))
+        self._run(visibility.STRIDE * 2)
+        self.assertEqual(len(tests), 1) # One pass for both tasks
+        self.assertGreaterEqual(tests[0], visibility.STRIDE)
+        self.assertEqual(len(self.resumed), 2)
+        self.assertFalse(self.service.running)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+Dream Cafe - Tracing module
+Version: 0.1.3
+
+The tracing module records where frame time goes, as Chrome Trace Event JSON (open in Perfetto or chrome://tracing).
+Hot paths are decorated with @tracer.span(); every resumption of a viztask coroutine is traced as well. Each span
+carries the frame number, and every frame start is marked with an instant event.
+
+Tracing is off unless 'seta d_trace "1"'. When off, span() returns the function as is, so it costs nothing. When on,
+the render thread only appends tuples to a buffer; a background thread turns them into JSON and writes the file
+(data/trace_<timestamp>.json). Enable before the traced modules are loaded (common does this right after the config).
+
+"""
+
+import os, time, json, threading, types, Queue
+from thread import get_ident
+import viz, viztask
+from functools import wraps
+from timeit import default_timer as clock
+from ruviz import utils
+
+FLUSH_SIZE = 4096 # Events per batch handed to the writer
+
+class TraceWriter(threading.Thread):
+    def __init__(self, path):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.queue = Queue.Queue()
+        self.file = open(path, 'w')
+        self.file.write('[\n')
+        self.first = True
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            self._write(batch)
+        self.file.write('\n]\n')
+        self.file.close()
+
+    def _write(self, batch):
+        lines = []
+        for ph, name, ts, dur, tid, frame in batch:
+            event = {'ph':ph, 'name':name, 'ts':ts, 'pid':1, 'tid':tid, 'args':{'frame':frame}}
+            if ph == 'X':
+                event['dur'] = dur
+            elif ph == 'i':
+                event['s'] = 'g'
+            lines.append(json.dumps(event))
+        if lines:
+            self.file.write(('\n' if self.first else ',\n') + ',\n'.join(lines))
+            self.first = False
+
+class Tracer(viz.EventClass):
+    def __init__(self):
+        viz.EventClass.__init__(self)
+        self.enabled = False
+        self.writer = None
+        self.buffer = []
+        self.start = clock()
+
+    def enable(self, path=None):
+        if self.enabled:
+            return
+        if path is None:
+            folder = utils.getPath('data')
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            path = os.path.join(folder, 'trace_{}.json'.format(time.strftime('%Y%m%d%H%M%S', time.localtime())))
+        self.path = path
+        self.writer = TraceWriter(path)
+        self.writer.start()
+        self.enabled = True
+
+        schedule = viztask.schedule
+        def _schedule(task, *args, **kwargs):
+            if isinstance(task, types.GeneratorType):
+                task = self._traceTask(task)
+            return schedule(task, *args, **kwargs)
+        viztask.schedule = _schedule
+
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+        self.callback(viz.EXIT_EVENT, self._onExit)
+        self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+
+    def _now(self):
+        return (clock() - self.start) * 1e6 #us
+
+    def _add(self, ph, name, ts, dur=0):
+        self.buffer.append((ph, name, ts, dur, get_ident(), viz.getFrameNumber()))
+        if len(self.buffer) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.writer.queue.put(self.buffer)
+            self.buffer = []
+
+    def span(self, name=None):
+        # Decorator; times each call as a complete event
+        def decorate(func):
+            if not self.enabled:
+                return func
+            label = name or func.__name__
+            @wraps(func)
+            def _traced(*args, **kwargs):
+                ts = self._now()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._add('X', label, ts, self._now() - ts)
+            return _traced
+        return decorate
+
+    def _traceTask(self, gen):
+        # Wraps a coroutine, so each resumption becomes a span. Sub-coroutines are wrapped when they are yielded.
+        label = 'task:' + gen.gi_code.co_name
+        value = None
+        while True:
+            ts = self._now()
+            try:
+                condition = gen.send(value)
+            except StopIteration:
+                self._add('X', label, ts, self._now() - ts)
+                return
+            self._add('X', label, ts, self._now() - ts)
+            if isinstance(condition, types.GeneratorType):
+                condition = self._traceTask(condition)
+            value = yield condition
+
+    def _onTimer(self, id):
+        self._add('i', 'frame', self._now())
+
+    def _onExit(self, *args):
+        self.flush()
+        self.writer.queue.put(None)
+        self.writer.join()
+        self.enabled = False
+
+tracer = Tracer()
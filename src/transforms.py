@@ -0,0 +1,58 @@
+"""
+Dream Cafe - Transforms module
+Version: 0.1.3
+
+The transforms module memoises transform queries within a frame. The main view, hand colliders and staring
+avatars all ask for the same positions and orientations many times per frame; with the cache only the first
+query in a frame crosses into Vizard. Every entry is stamped with the frame number it was read in and is stale
+in any other frame; there is no timer, so the cache costs nothing in frames nobody asks it.
+
+Only use it for nodes that are not moved from Python halfway through a frame (views, trackers, linked nodes),
+or call invalidate() after moving them. Returned positions and orientations are shared, so don't modify them.
+
+"""
+
+import viz
+
+class TransformCache():
+    def __init__(self):
+        self.positions = {} # mode: {node: (frame, position)}
+        self.eulers = {}    # mode: {node: (frame, euler)}
+        self.hits = 0
+        self.misses = 0
+
+    def getPosition(self, node, mode=viz.ABS_GLOBAL):
+        cache = self.positions.get(mode)
+        if cache is None:
+            cache = self.positions[mode] = {}
+        frame = viz.getFrameNumber()
+        entry = cache.get(node)
+        if entry and entry[0] == frame:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        pos = node.getPosition(mode)
+        cache[node] = (frame, pos)
+        return pos
+
+    def getEuler(self, node, mode=viz.ABS_GLOBAL):
+        cache = self.eulers.get(mode)
+        if cache is None:
+            cache = self.eulers[mode] = {}
+        frame = viz.getFrameNumber()
+        entry = cache.get(node)
+        if entry and entry[0] == frame:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        euler = node.getEuler(mode)
+        cache[node] = (frame, euler)
+        return euler
+
+    def invalidate(self, node):
+        # Call after moving node from Python, and when it is removed
+        for caches in [self.positions, self.eulers]:
+            for cache in caches.values():
+                cache.pop(node, None)
+
+transforms = TransformCache()
@@ -0,0 +1,86 @@
+"""
+Dream Cafe - Visibility module
+Version: 0.1.3
+
+The visibility module decides whether nodes are in view of the participant. Instead of every task polling inView
+on its own, tasks register with the visibility service ("wake me when these are out of view"). Every STRIDE frames,
+like the polling it replaced, the service tests all watched nodes in a single vectorised pass and resumes the tasks
+whose nodes all left the view. Boxes come from the bounds cache, so static nodes are never traversed again.
+
+"""
+
+import viz, viztask
+import numpy as np
+from bounds import bounds
+from transforms import transforms
+
+HALF_FOV = 70 #half FOV (horiz, incl. buffer)
+STRIDE = 6 #frames between tests
+
+class Watch():
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.signal = viztask.Signal()
+
+class VisibilityService(viz.EventClass):
+    def __init__(self, view=viz.MainView, window=viz.MainWindow, fov=HALF_FOV, stride=STRIDE):
+        viz.EventClass.__init__(self)
+        self.view = view
+        self.window = window
+        self.fov = fov
+        self.stride = stride
+        self.watches = []
+        self.running = False
+        self.frames = 0
+        self.callback(viz.TIMER_EVENT, self._onTimer)
+
+    def getInView(self, nodes):
+        # Horizontal FOV test for all nodes at once; nodes outside the FOV get an extra culling test (large objects)
+        if not nodes:
+            return []
+        centers = np.array([bounds.getBoundingBox(n).center for n in nodes], dtype=float)
+        d = centers - np.array(transforms.getPosition(self.view), dtype=float)
+        ba = np.degrees(np.arctan2(d[:,0], d[:,2]))
+        va = transforms.getEuler(self.view)[0]
+        inFov = np.abs((va - ba + 180.0) % 360.0 - 180.0) < self.fov
+        return [bool(f) or not self.window.isCulled(n) for f,n in zip(inFov,nodes)]
+
+    def inView(self, node):
+        return self.getInView([node])[0]
+
+    def waitOutOfView(self, *nodes):
+        # Yield the result from a task; it resumes once all nodes are out of view at the same time
+        watch = Watch(nodes)
+        self.watches.append(watch)
+        if not self.running:
+            self.running = True
+            self.frames = 0
+            self.starttimer(0, viz.FASTEST_EXPIRATION, viz.FOREVER)
+        return watch.signal.wait()
+
+    def _onTimer(self, id):
+        self.frames += 1
+        if self.frames % self.stride:
+            return
+        nodes = []
+        index = {}
+        for watch in self.watches:
+            for n in watch.nodes:
+                if n not in index:
+                    index[n] = len(nodes)
+                    nodes.append(n)
+        visible = self.getInView(nodes)
+
+        waiting = []
+        for watch in self.watches:
+            if any([visible[index[n]] for n in watch.nodes]):
+                waiting.append(watch)
+            else:
+                watch.signal.send()
+        self.watches = waiting
+
+        if not self.watches:
+            self.killtimer(0)
+            self.running = False
+
+visibility = VisibilityService()